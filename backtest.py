@@ -0,0 +1,219 @@
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+import utils
+import plan
+from loader import build_league, build_team, read_league_data
+from model import FantasyModel
+from premierleague import PremierLeague
+from scoring import PARAMS_FILE
+from fantasyteam import FantasyTeam
+from solver import SolverConfig
+from sweep import Scenario, calibrated_grid
+
+# Leagues parsed by a worker process, by data directory, with each player's price in every played gameweek
+_seasons = {}
+
+
+def load_season(data_dir: str) -> tuple[PremierLeague, dict]:
+    """
+    Parses a stored season once per process. Returns the league and each player's price by gameweek where the
+    history records it.
+    """
+    if data_dir not in _seasons:
+        basic_data, fixture_data, player_data = read_league_data(data_dir)
+        pl = build_league(basic_data, fixture_data, player_data)
+        prices = {
+            id: {h['round']: h['value'] for h in summary['history'] if 'value' in h}
+            for id, summary in player_data.items()
+        }
+        _seasons[data_dir] = pl, prices
+    return _seasons[data_dir]
+
+
+def price_at(prices: dict, gw: int) -> int | None:
+    """A player's price in their latest recorded gameweek up to gw, None if they have no history by then"""
+    known = [g for g in prices if g <= gw]
+    return prices[max(known)] if known else None
+
+
+def actual_points(player, gw: int) -> int:
+    return sum(player.points.get(gw, []))
+
+
+def score_gameweek(team: FantasyTeam, gw: int) -> int:
+    """Points the starting 11 actually scored, doubling the captain or the vice captain if the captain didn't play"""
+    players = team.players[gw]
+    points = sum(actual_points(players[id], gw) for id in team.starting[gw])
+    captain = team.captain[gw]
+    if not sum(captain.minutes.get(gw, [])):
+        captain = team.vice_captain[gw]
+    return points + actual_points(captain, gw)
+
+
+def next_team(team: FantasyTeam, week: plan.GameweekPlan, pl: PremierLeague, gw: int) -> FantasyTeam:
+    """The team holding the planned selection for gw, carrying over the bank and squad value"""
+    following = FantasyTeam(bank=team.bank, squad_value=team.squad_value)
+    single = plan.Plan(range(gw, gw + 1), (week,))
+    single.apply(following, pl)
+    return following
+
+
+def replay(pl: PremierLeague, my_team_data: dict, prices: dict, scenario: Scenario, start_gw: int, end_gw: int,
+           config: SolverConfig, prune: bool = False) -> list[dict]:
+    """
+    Replays the season from start_gw, deciding each following gameweek with only the information available at
+    the time: points up to the current gameweek, each player's latest price up to it and full availability.
+    Players with no history yet cannot be bought. my_team_data is the starting squad, held at start_gw, and
+    must only contain players already in the league by then. The first planned week is applied and scored
+    against the points actually scored. The previous plan is passed on as a MIP start, which only the pulp
+    backend (CBC) uses; HiGHS solves every week from scratch.
+    """
+    last_gw = pl.current_gw
+    players = pl.get_players()
+    # Prices and availability are replaced for the replay and restored afterwards, leaving the league as it was
+    saved = {id: (player.cost, player.chance_of_playing) for id, player in players.items()}
+
+    late = [p['element'] for p in my_team_data['picks'] if price_at(prices.get(p['element'], {}), start_gw) is None]
+    if late:
+        raise ValueError(f"Starting squad has players with no history by gameweek {start_gw}: {late}")
+
+    rows = []
+    previous = None
+    try:
+        for player in players.values():
+            player.chance_of_playing = None
+        pl.current_gw = start_gw
+        team = build_team(pl, my_team_data, [])
+        for g in range(start_gw, end_gw):
+            pl.current_gw = g
+            available = []
+            for player in players.values():
+                price = price_at(prices.get(player.id, {}), g)
+                if price is not None:
+                    player.cost = price
+                    available.append(player)
+
+            # Sell and buy at this week's prices
+            team.squad_value = sum(p.cost for p in team.players[g].values()) + team.bank
+
+            horizon_len = min(scenario.horizon_len, last_gw - g)
+            model = FantasyModel(pl, team, scenario.params())
+            start = time.perf_counter()
+            warm_start = plan.shift_plan(previous, range(g, g + horizon_len + 1)) if previous else None
+            model.solve(horizon_len, scenario.history_len, prune=prune, config=config, warm_start=warm_start,
+                        players=available)
+            if model.plan is None:
+                print(f"GW {g}: {model.solution_status}")
+                break
+
+            week = model.plan[g + 1]
+            team = next_team(team, week, pl, g + 1)
+            team.bank = team.squad_value - sum(p.cost for p in team.players[g + 1].values())
+            previous = plan.plan_from_team(model.team, model.plan.gameweeks)
+
+            expected = dict(zip(week.squad, week.expected_points))
+            rows.append({
+                'gameweek': g + 1,
+                'points': score_gameweek(team, g + 1),
+                'expected_points': round(sum(expected[id] for id in week.starting) + expected[week.captain], 2),
+                'transfers': len(week.transfers_in),
+                'gap': model.gap,
+                'solve_time': round(time.perf_counter() - start, 3)
+            })
+    finally:
+        pl.current_gw = last_gw
+        for id, (cost, chance) in saved.items():
+            players[id].cost = cost
+            # Stored as the fraction the getter returned, as the setter takes a percentage
+            players[id]._chance_of_playing = chance
+
+    return rows
+
+
+def run_backtest(data_dir: str, scenario: Scenario, start_gw: int, end_gw: int | None, config: SolverConfig,
+                 prune: bool = False, squad_file: str | None = None) -> dict:
+    """Replays one season under one scenario, starting from squad_file (the season's my_team.json by default)"""
+    pl, prices = load_season(data_dir)
+    my_team_data = utils.read_from_json_file(squad_file or f'{data_dir}/my_team.json')
+    rows = replay(pl, my_team_data, prices, scenario, start_gw, end_gw or pl.current_gw, config, prune)
+    return {
+        'season': data_dir,
+        **asdict(scenario),
+        'points': sum(r['points'] for r in rows),
+        'expected_points': round(sum(r['expected_points'] for r in rows), 2),
+        'transfers': sum(r['transfers'] for r in rows),
+        'gameweeks': rows
+    }
+
+
+def backtest(seasons: list[str], scenarios: list[Scenario], start_gw: int, end_gw: int | None = None,
+             workers: int | None = None, config: SolverConfig | None = None, prune: bool = False,
+             squad_file: str | None = None) -> list[dict]:
+    """
+    Replays every season under every scenario in parallel processes, returning results in submission order.
+    The default pulp backend lets each week's solve start from the previous week's plan.
+    """
+    config = config or SolverConfig(backend='pulp', msg=False)
+    jobs = [(season, scenario) for season in seasons for scenario in scenarios]
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_backtest, season, scenario, start_gw, end_gw, config, prune, squad_file): i
+            for i, (season, scenario) in enumerate(jobs)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            print(f"Replayed {done}/{len(jobs)} runs")
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay stored seasons gameweek by gameweek and score the plans")
+    parser.add_argument('--data-dir', nargs='+', default=['data'], help="One stored season per directory")
+    parser.add_argument('--start', type=int, default=2, help="First gameweek to decide from")
+    parser.add_argument('--end', type=int, help="Last gameweek to score (defaults to the season's current one)")
+    parser.add_argument('--horizon', type=int, nargs='+', default=[Scenario.horizon_len])
+    parser.add_argument('--history', type=int, nargs='+')
+    parser.add_argument('--fixture-multiplier', type=float, nargs='+')
+    parser.add_argument('--home-adv', type=float, nargs='+')
+    parser.add_argument('--difficulty-multiplier', type=float, nargs='+')
+    parser.add_argument('--params', default=PARAMS_FILE,
+                        help="Fit by calibrate.py used for the options left out, best fit on other seasons")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--squad', help="my_team.json style file with the squad held at --start "
+                                        "(defaults to each season's my_team.json)")
+    parser.add_argument('--backend', choices=['pulp', 'highs'], default='pulp',
+                        help="pulp warm-starts each week from the previous plan, highs does not")
+    parser.add_argument('--time-limit', type=float, help="Seconds each gameweek's solve may take")
+    parser.add_argument('--gap', type=float, help="Relative MIP gap at which a gameweek is considered solved")
+    parser.add_argument('--prune', action='store_true', help="Leave out dominated players (heuristic)")
+    parser.add_argument('--csv', help="Write every scored gameweek to this file")
+    args = parser.parse_args()
+
+    scenarios = calibrated_grid(args)
+    config = SolverConfig(args.backend, time_limit=args.time_limit, gap=args.gap, msg=False)
+    results = backtest(args.data_dir, scenarios, args.start, args.end, args.workers, config, args.prune,
+                       args.squad)
+
+    columns = [c for c in results[0] if c != 'gameweeks']
+    print('\t'.join(columns))
+    for row in sorted(results, key=lambda r: r['points'], reverse=True):
+        print('\t'.join(str(row[c]) for c in columns))
+
+    if args.csv:
+        with open(args.csv, "w+", newline='') as file:
+            run_columns = ['season', *asdict(Scenario())]
+            writer = csv.DictWriter(file, fieldnames=run_columns + list(results[0]['gameweeks'][0]))
+            writer.writeheader()
+            for row in results:
+                for gw in row['gameweeks']:
+                    writer.writerow({**{c: row[c] for c in run_columns}, **gw})
+
+
+if __name__ == '__main__':
+    main()
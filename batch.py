@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import snapshot
+import utils
+from fetcher import BulkFetcher
+from loader import build_team
+from model import FantasyModel
+from plan import plan_from_team
+from premierleague import PremierLeague
+from fantasyteam import FantasyTeam
+from scoring import PARAMS_FILE, ScoringParameters, ScoreMatrix, expected_points, load_calibration
+from solver import SolverConfig
+
+BASE_URL = "https://fantasy.premierleague.com/api/"
+
+# League and expected points shared by every manager solved in a worker process, set once by init_worker
+_league = None
+_scores = None
+
+
+def manager_dir(data_dir: str, manager_id: int) -> str:
+    return f'{data_dir}/managers/{manager_id}'
+
+
+def fetch_managers(manager_ids: list[int], gw: int, data_dir: str = 'data', workers: int = 8) -> None:
+    """Downloads every manager's picks for the gameweek and their transfers into data/managers/<id>/"""
+    jobs = {}
+    for id in manager_ids:
+        directory = manager_dir(data_dir, id)
+        os.makedirs(directory, exist_ok=True)
+        jobs[(id, 'my_team')] = (f'{directory}/my_team.json', f"{BASE_URL}entry/{id}/event/{gw}/picks/")
+        jobs[(id, 'my_transfers')] = (f'{directory}/my_transfers.json', f"{BASE_URL}entry/{id}/transfers/")
+    BulkFetcher(workers=workers).fetch_all(jobs)
+
+
+def read_manager(pl: PremierLeague, data_dir: str, manager_id: int) -> FantasyTeam:
+    my_team_data = utils.read_from_json_file(f'{manager_dir(data_dir, manager_id)}/my_team.json')
+    transfer_data = utils.read_from_json_file(f'{manager_dir(data_dir, manager_id)}/my_transfers.json')
+    return build_team(pl, my_team_data, transfer_data)
+
+
+def init_worker(pl: PremierLeague, scores: ScoreMatrix) -> None:
+    global _league, _scores
+    _league = pl
+    _scores = scores
+    # Keep stdout for the JSON lines: the model's progress messages go to stderr
+    sys.stdout = sys.stderr
+
+
+def run_manager(manager_id: int, team: FantasyTeam, horizon_len: int, history_len: int, config: SolverConfig,
+                prune: bool = False) -> dict:
+    """Solves one manager's team against the shared league and expected points"""
+    model = FantasyModel(_league, team)
+    start = time.perf_counter()
+    model.solve(horizon_len, history_len, prune=prune, config=config, scores=_scores)
+
+    gameweeks = range(_league.current_gw + 1, _league.current_gw + horizon_len + 1)
+    return {
+        'manager_id': manager_id,
+        'status': model.status,
+        'solution_status': model.solution_status,
+        'objective_value': model.objective_value,
+        'gap': model.gap,
+        'solve_time': round(time.perf_counter() - start, 3),
+        'plan': plan_from_team(team, gameweeks)
+    }
+
+
+def batch(pl: PremierLeague, teams: dict, horizon_len: int, history_len: int,
+          params: ScoringParameters | None = None, workers: int | None = None, config: SolverConfig | None = None,
+          prune: bool = False):
+    """
+    Solves every manager's team in parallel, yielding each result as soon as its solve finishes. Expected
+    points are computed once here and handed to each worker process with the league when it starts.
+    """
+    config = config or SolverConfig(backend='highs', msg=False)
+    gameweeks = range(pl.current_gw, pl.current_gw + horizon_len + 1)
+    scores = expected_points(pl, gameweeks, history_len, params)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(pl, scores)) as executor:
+        futures = [
+            executor.submit(run_manager, id, team, horizon_len, history_len, config, prune)
+            for id, team in teams.items()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Optimise many managers' teams against one shared league")
+    parser.add_argument('managers', type=int, nargs='*', help="Manager (entry) ids")
+    parser.add_argument('--managers-file', help="File with one manager id per line")
+    parser.add_argument('--refresh', action='store_true', help="Fetch every manager's picks and transfers first")
+    parser.add_argument('--horizon', type=int, default=10)
+    parser.add_argument('--history', type=int, help="Gameweeks of history (defaults to the calibrated one)")
+    parser.add_argument('--params', default=PARAMS_FILE, help="Scoring parameters fitted by calibrate.py")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--backend', choices=['pulp', 'highs'], default='highs')
+    parser.add_argument('--time-limit', type=float, help="Seconds each manager's solve may take")
+    parser.add_argument('--gap', type=float, help="Relative MIP gap at which a manager's solve is considered done")
+    parser.add_argument('--prune', action='store_true', help="Leave out dominated players (heuristic)")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--snapshot', default='data/snapshot.bin')
+    parser.add_argument('--output', help="Append one JSON line per manager to this file instead of stdout")
+    args = parser.parse_args()
+
+    manager_ids = list(args.managers)
+    if args.managers_file:
+        with open(args.managers_file) as file:
+            manager_ids += [int(line) for line in file if line.strip()]
+
+    pl = snapshot.load_or_build_league(args.snapshot, args.data_dir)
+    if args.refresh:
+        fetch_managers(manager_ids, pl.current_gw, args.data_dir)
+    teams = {id: read_manager(pl, args.data_dir, id) for id in manager_ids}
+
+    params, history_len = load_calibration(args.params)
+    history_len = args.history if args.history is not None else history_len
+    config = SolverConfig(args.backend, time_limit=args.time_limit, gap=args.gap, msg=False)
+    output = open(args.output, "a") if args.output else sys.stdout
+    try:
+        for done, result in enumerate(batch(pl, teams, args.horizon, history_len, params, args.workers, config,
+                                            args.prune), start=1):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            print(f"Solved {done}/{len(teams)} managers", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
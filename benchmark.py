@@ -0,0 +1,232 @@
+import argparse
+import copy
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import snapshot
+import synthetic
+from fetcher import BulkFetcher
+from loader import build_league, build_team, read_league_data
+from matrixmodel import MatrixModel, CompactMatrixModel
+from model import FantasyModel, SQUAD_ROLES, STARTING_MIN, STARTING_MAX
+from scoring import expected_points
+from solver import SolverConfig
+
+
+class StubServer:
+    """Local HTTP server answering element-summary requests from generated data, for offline fetch benchmarks"""
+
+    def __init__(self, player_data: dict, latency: float = 0.0) -> None:
+        bodies = {f"/element-summary/{id}/": json.dumps(summary).encode() for id, summary in player_data.items()}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = bodies.get(self.path)
+                time.sleep(latency)
+                self.send_response(200 if body else 404)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body or b'')))
+                self.end_headers()
+                self.wfile.write(body or b'')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def __enter__(self) -> 'StubServer':
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(fn, *args, **kwargs) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def check_formulations(args: argparse.Namespace) -> list[dict]:
+    """
+    Solves synthetic leagues with both matrix formulations and the PuLP one, comparing their optimal objectives
+    and plans, and the matrix formulations' sizes, LP relaxation bounds and solve times
+    """
+    checks = []
+    for seed in range(args.seed, args.seed + args.check_formulations):
+        pl, team = synthetic.generate_league(
+            clubs=args.clubs, players_per_club=args.players_per_club, history_len=args.history_len,
+            double_gameweeks=args.double_gameweeks, blank_gameweeks=args.blank_gameweeks, seed=seed
+        )
+        players = list(pl.get_players().values())
+        gameweeks = range(pl.current_gw, pl.current_gw + args.horizon + 1)
+        score_matrix = expected_points(pl, gameweeks, args.history_len, players=players)
+        scores = score_matrix.values
+
+        check = {'seed': seed}
+        solutions = {}
+        for name, formulation in (('full', MatrixModel), ('compact', CompactMatrixModel)):
+            matrix = formulation(players, list(pl.clubs.values()), gameweeks, team, scores.copy(), SQUAD_ROLES,
+                                 STARTING_MIN, STARTING_MAX)
+            matrix.solve(relax=True)
+            relaxation = matrix.objective_value
+            seconds, _ = timed(matrix.solve)
+            solutions[name] = matrix.solution
+            check[name] = {
+                'variables': int(matrix.n_vars),
+                'constraints': int(matrix.A.shape[0]),
+                'nonzeros': int(matrix.A.nnz),
+                'relaxation': relaxation,
+                'objective_value': matrix.objective_value,
+                'nodes': matrix.solver_stats['nodes'],
+                'seconds': seconds
+            }
+
+        # The PuLP formulation solved by CBC, on a copy of the team since the plan is stored in it
+        model = FantasyModel(pl, copy.deepcopy(team))
+        seconds, _ = timed(model.solve, args.horizon, args.history_len, config=SolverConfig('pulp', msg=False),
+                           scores=score_matrix)
+        stats = model.report.model
+        check['pulp'] = {
+            'variables': sum(stats['variables'].values()),
+            'constraints': sum(stats['constraints'].values()),
+            'nonzeros': stats['nonzeros'],
+            'objective_value': model.objective_value,
+            'seconds': seconds
+        }
+        pulp_squads = np.array([[p.id in model.team.players[g] for g in gameweeks[1:]] for p in players])
+
+        objectives = [check[name]['objective_value'] for name in ('full', 'compact', 'pulp')]
+        check['same_objective'] = max(objectives) - min(objectives) < 1e-6
+        check['same_plan'] = all(
+            (solutions['full'][f][:, 1:] == solutions['compact'][f][:, 1:]).all() for f in ('x', 'y', 'z', 'cc')
+        ) and bool((solutions['full']['z'][:, 1:] == pulp_squads).all())
+        checks.append(check)
+
+    return checks
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Times every stage separately, repeating each args.repeat times"""
+    runs = {}
+
+    def record(stage: str, seconds: float) -> None:
+        runs.setdefault(stage, []).append(seconds)
+
+    data = synthetic.generate_data(
+        clubs=args.clubs, players_per_club=args.players_per_club, history_len=args.history_len,
+        double_gameweeks=args.double_gameweeks, blank_gameweeks=args.blank_gameweeks, seed=args.seed
+    )
+    models = {}
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        synthetic.write_data(data_dir, data)
+        snapshot_path = f"{data_dir}/snapshot.bin"
+
+        for _ in range(args.repeat):
+            seconds, (basic_data, fixture_data, player_data) = timed(read_league_data, data_dir)
+            record('json_load', seconds)
+
+            seconds, pl = timed(build_league, basic_data, fixture_data, player_data)
+            record('construction', seconds)
+
+            record('snapshot_write', timed(snapshot.write_snapshot, snapshot_path, basic_data, fixture_data,
+                                           player_data, data_dir)[0])
+            record('snapshot_load', timed(snapshot.load_league, snapshot_path)[0])
+
+            for backend in args.backend:
+                team = build_team(pl, data['my_team'], data['my_transfers'])
+                model = FantasyModel(pl, team)
+                model.solve(args.horizon, args.history_len, prune=args.prune,
+                            config=SolverConfig(backend, threads=args.threads, time_limit=args.time_limit, msg=False))
+                for phase, seconds in model.timings.items():
+                    record(f"{backend}_{phase}", seconds)
+                models[backend] = {'status': model.status, 'objective_value': model.objective_value, 'gap': model.gap}
+
+        if args.fetch:
+            with StubServer(data['players'], args.fetch_latency) as stub:
+                fetcher = BulkFetcher(workers=args.fetch_workers, rate_limit=None)
+                jobs = {
+                    id: (f"{data_dir}/players/{id}.json", f"{stub.url}element-summary/{id}/")
+                    for id in list(data['players'])[:args.fetch]
+                }
+                seconds, _ = timed(fetcher.fetch_all, jobs)
+                record('fetch', seconds)
+
+    stages = {
+        stage: {'min': min(times), 'median': statistics.median(times), 'runs': times}
+        for stage, times in runs.items()
+    }
+    if 'fetch' in stages:
+        stages['fetch']['requests_per_second'] = args.fetch / stages['fetch']['min']
+
+    results = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': vars(args),
+        'players': len(data['players']),
+        'stages': stages,
+        'models': models
+    }
+    if args.check_formulations:
+        results['formulations'] = check_formulations(args)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark data loading, model building and solving on a synthetic league"
+    )
+    parser.add_argument('--clubs', type=int, default=20)
+    parser.add_argument('--players-per-club', type=int, default=30)
+    parser.add_argument('--history-len', type=int, default=10)
+    parser.add_argument('--double-gameweeks', type=int, default=2)
+    parser.add_argument('--blank-gameweeks', type=int, default=1)
+    parser.add_argument('--horizon', type=int, default=3)
+    parser.add_argument('--backend', choices=['pulp', 'highs'], nargs='+', default=['pulp', 'highs'])
+    parser.add_argument('--prune', action='store_true')
+    parser.add_argument('--threads', type=int)
+    parser.add_argument('--time-limit', type=float)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--fetch', type=int, default=0, help="Fetch this many player summaries from a local stub server"
+    )
+    parser.add_argument('--fetch-workers', type=int, default=8)
+    parser.add_argument('--fetch-latency', type=float, default=0.01, help="Seconds the stub server waits per request")
+    parser.add_argument(
+        '--check-formulations', type=int, default=0,
+        help="Compare the full, compact and PuLP formulations on this many synthetic leagues"
+    )
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w+") as file:
+            json.dump(results, file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
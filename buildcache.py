@@ -0,0 +1,89 @@
+import glob
+import hashlib
+import os
+import pickle
+import utils
+from loader import add_history, build_league, read_league_data, read_team
+from premierleague import PremierLeague
+from fantasyteam import FantasyTeam
+
+# Bumped whenever PremierLeague, Player, Club or FantasyTeam change shape, invalidating older caches
+VERSION = 2
+
+# Input files that the league and the team are built from, besides the per-player summaries
+LEAGUE_FILES = ('basic.json', 'fixtures.json')
+TEAM_FILES = ('my_team.json', 'my_transfers.json')
+
+
+def hash_file(filepath: str) -> str:
+    with open(filepath, "rb") as file:
+        return hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+
+
+def hash_league_inputs(data_dir: str = 'data') -> dict:
+    """Content hash of every file the league is built from, keyed by its path relative to data_dir"""
+    paths = [*LEAGUE_FILES]
+    paths += sorted(os.path.relpath(p, data_dir) for p in glob.glob(f'{data_dir}/players/*.json'))
+    return {path: hash_file(f'{data_dir}/{path}') for path in paths}
+
+
+def hash_inputs(data_dir: str = 'data') -> dict:
+    """Content hash of every input file, keyed by its path relative to data_dir"""
+    return {**hash_league_inputs(data_dir), **{path: hash_file(f'{data_dir}/{path}') for path in TEAM_FILES}}
+
+
+def read_cache(filepath: str) -> dict | None:
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, "rb") as file:
+            cached = pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return cached if cached.get('version') == VERSION else None
+
+
+def write_cache(filepath: str, hashes: dict, pl: PremierLeague, team: FantasyTeam) -> None:
+    """Writes the league and team atomically, pickled together so the team keeps referencing league players"""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump({'version': VERSION, 'hashes': hashes, 'league': pl, 'team': team}, file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, filepath)
+
+
+def load_or_build(filepath: str = 'data/build.pkl', data_dir: str = 'data') -> tuple[PremierLeague, FantasyTeam]:
+    """
+    Returns the built league and team, loading them from the cache when no input file has changed. When only
+    player summaries changed, just those players' histories are rebuilt. When only the team files changed, just
+    the team is rebuilt. Anything else rebuilds everything from the JSON data.
+    """
+    hashes = hash_inputs(data_dir)
+    cached = read_cache(filepath)
+
+    if cached is not None and cached['hashes'] == hashes:
+        print("Build cache: unchanged")
+        return cached['league'], cached['team']
+
+    if cached is not None and all(cached['hashes'].get(f) == hashes[f] for f in LEAGUE_FILES):
+        pl, team = cached['league'], cached['team']
+        players = pl.get_players()
+        changed = [
+            path for path, digest in hashes.items()
+            if path.startswith('players/') and cached['hashes'].get(path) != digest
+        ]
+        for path in changed:
+            id = int(os.path.splitext(os.path.basename(path))[0])
+            if id in players:
+                add_history(players[id], utils.read_from_json_file(f'{data_dir}/{path}'))
+
+        if any(cached['hashes'].get(f) != hashes[f] for f in TEAM_FILES):
+            team = read_team(pl, data_dir)
+        print(f"Build cache: rebuilt {len(changed)} players")
+    else:
+        pl = build_league(*read_league_data(data_dir))
+        team = read_team(pl, data_dir)
+        print("Build cache: rebuilt everything")
+
+    write_cache(filepath, hashes, pl, team)
+    return pl, team
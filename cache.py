@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable
+import utils
+
+# Seconds a cached response is trusted without asking the server, by endpoint. The first matching pattern wins.
+DEFAULT_TTLS = (
+    (r'bootstrap-static/', 60 * 60),
+    (r'fixtures/', 6 * 60 * 60),
+    (r'element-summary/\d+/', 24 * 60 * 60),
+    (r'entry/\d+/', 10 * 60),
+)
+
+
+class HttpCache:
+    """
+    Remembers the validators (ETag / Last-Modified), content digest and fetch time of every URL written to
+    the data directory. Fresh entries are served from disk without a request, stale ones are revalidated
+    with a conditional request and files are only rewritten when their content has changed.
+    """
+
+    def __init__(self, index_path: str = 'data/cache.json', ttls: tuple = DEFAULT_TTLS, default_ttl: int = 0) -> None:
+        self.index_path = index_path
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in ttls]
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.stats = {'fresh': 0, 'not_modified': 0, 'unchanged': 0, 'written': 0}
+
+        self.index = {}
+        if os.path.exists(index_path):
+            with open(index_path, "r") as file:
+                self.index = json.load(file)
+
+    def get_ttl(self, url: str) -> int:
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def is_fresh(self, filepath: str, url: str) -> bool:
+        entry = self.index.get(url)
+        if entry is None or entry['filepath'] != filepath or not os.path.exists(filepath):
+            return False
+        return time.time() - entry['fetched_at'] < self.get_ttl(url)
+
+    def get_headers(self, filepath: str, url: str) -> dict:
+        """Conditional request headers, only sent when we still hold the file they validate"""
+        entry = self.index.get(url)
+        if entry is None or entry['filepath'] != filepath or not os.path.exists(filepath):
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def load(self, filepath: str, url: str, request: Callable = utils.fetch_response) -> dict:
+        """
+        Returns the data for url, stored at filepath. request(url, headers) must return a requests.Response.
+        """
+        if self.is_fresh(filepath, url):
+            self.count('fresh')
+            return utils.read_from_json_file(filepath)
+
+        response = request(url, self.get_headers(filepath, url))
+        entry = {
+            'filepath': filepath,
+            'fetched_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+
+        if response.status_code == 304:
+            self.update(url, {**self.index.get(url, {}), **{k: v for k, v in entry.items() if v is not None}})
+            self.count('not_modified')
+            return utils.read_from_json_file(filepath)
+
+        data = json.loads(response.text)
+        entry['digest'] = hashlib.sha1(response.content).hexdigest()
+        previous = self.index.get(url, {})
+        if previous.get('digest') == entry['digest'] and os.path.exists(filepath):
+            self.count('unchanged')
+        else:
+            utils.write_to_json_file(filepath, data)
+            self.count('written')
+
+        self.update(url, entry)
+        return data
+
+    def update(self, url: str, entry: dict) -> None:
+        with self.lock:
+            self.index[url] = entry
+
+    def count(self, outcome: str) -> None:
+        with self.lock:
+            self.stats[outcome] += 1
+
+    def save(self) -> None:
+        """Writes the index atomically so an interrupted refresh never leaves it half written"""
+        tmp_path = f"{self.index_path}.tmp"
+        with self.lock:
+            with open(tmp_path, "w+") as file:
+                json.dump(self.index, file)
+            os.replace(tmp_path, self.index_path)
@@ -0,0 +1,196 @@
+import argparse
+import time
+from dataclasses import asdict, dataclass
+import numpy as np
+import snapshot
+import utils
+from premierleague import PremierLeague
+from scoring import PARAMS_FILE, ScoringParameters, history_arrays
+
+
+@dataclass
+class Observations:
+    """
+    One entry per player and target gameweek in which the player appeared, holding everything the prediction
+    of scoring.expected_points needs as the terms it is linear in. With the history window ending the week
+    before the target, the average is (points - fixture_multiplier * aged) / games, and the fixture multiplier
+    is fixtures - difficulty_multiplier * difficulty + home_adv * home.
+    """
+    actual: np.ndarray
+    points: np.ndarray
+    aged: np.ndarray
+    games: np.ndarray
+    fixtures: np.ndarray
+    difficulty: np.ndarray
+    home: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.actual)
+
+
+def minutes_array(players: list, gameweeks: range) -> np.ndarray:
+    """Dense (players x gameweeks) array of the minutes played, summed over a double gameweek's fixtures"""
+    minutes = np.zeros((len(players), len(gameweeks)))
+    for i, player in enumerate(players):
+        for g, gw_minutes in player.minutes.items():
+            if g in gameweeks:
+                minutes[i, g - gameweeks.start] = sum(gw_minutes)
+    return minutes
+
+
+def club_fixture_arrays(pl: PremierLeague, gameweeks: range) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+    """Dense (clubs x gameweeks) arrays of each club's number of fixtures, summed difficulty and home fixtures"""
+    club_index = {id: i for i, id in enumerate(pl.clubs)}
+    count, difficulty, home = (np.zeros((len(club_index), len(gameweeks))) for _ in range(3))
+
+    for club in pl.clubs.values():
+        for g in gameweeks:
+            for f in club.fixtures.get(g, []):
+                at_home = f.home_team == club.id
+                i, j = club_index[club.id], g - gameweeks.start
+                count[i, j] += 1
+                difficulty[i, j] += f.home_team_difficulty if at_home else f.away_team_difficulty
+                home[i, j] += at_home
+
+    return count, difficulty, home, club_index
+
+
+def observations(pl: PremierLeague, history_len: int, first_gw: int = 2, last_gw: int | None = None,
+                 players: list | None = None) -> Observations:
+    """
+    Builds the observations for predicting every gameweek from first_gw to last_gw (the current one by default)
+    from the history_len + 1 weeks before it, as FantasyModel would have with that week as the next one.
+    Only player-gameweeks where the player appeared and had played before are kept, since chance_of_playing
+    is what accounts for availability in the model.
+    """
+    players = list(pl.get_players().values()) if players is None else players
+    last_gw = last_gw or pl.current_gw
+    season = range(1, last_gw + 1)
+
+    points, games = history_arrays(players, season)
+    minutes = minutes_array(players, season)
+    count, difficulty, home, club_index = club_fixture_arrays(pl, season)
+    clubs = np.array([club_index[p.club_id] for p in players], dtype=np.intp)
+
+    # Window sums for every target through cumulative sums over the season, padded so week 0 sums to nothing
+    targets = np.arange(first_gw, last_gw + 1)
+    end = targets - 1
+    start = np.maximum(end - history_len, 1)
+    weeks = np.arange(1, last_gw + 1)
+
+    def window(values: np.ndarray) -> np.ndarray:
+        cumulative = np.hstack([np.zeros((len(values), 1)), values.cumsum(axis=1)])
+        return cumulative[:, end] - cumulative[:, start - 1]
+
+    window_points = window(points)
+    aged = end * window_points - window(points * weeks)
+    window_games = window(games)
+
+    j = targets - 1
+    keep = (minutes[:, j] > 0) & (window_games > 0) & (count[clubs][:, j] > 0)
+    return Observations(
+        actual=points[:, j][keep],
+        points=window_points[keep],
+        aged=aged[keep],
+        games=window_games[keep],
+        fixtures=count[clubs][:, j][keep],
+        difficulty=difficulty[clubs][:, j][keep],
+        home=home[clubs][:, j][keep]
+    )
+
+
+def moments(obs: Observations) -> dict:
+    """
+    Cross products of the prediction's terms. The residual and both regressors are linear in the fixture
+    multiplier f, as r0 + f * r1, u0 - f * u1 and v0 - f * v1, so every sum of squares over the observations
+    is a quadratic in f whose coefficients are computed here once.
+    """
+    average, decay = obs.points / obs.games, obs.aged / obs.games
+    terms = {
+        'r': (obs.actual - average * obs.fixtures, decay * obs.fixtures),
+        'u': (average * obs.home, -decay * obs.home),
+        'v': (-average * obs.difficulty, decay * obs.difficulty)
+    }
+    return {
+        a + b: np.array([p[0] @ q[0], p[0] @ q[1] + p[1] @ q[0], p[1] @ q[1]])
+        for a, p in terms.items() for b, q in terms.items() if a <= b
+    }
+
+
+def squared_errors(m: dict, fixture_multiplier, home_adv, difficulty_multiplier) -> np.ndarray:
+    """
+    Sum of squared prediction errors of every parameter combination, broadcasting the three arguments, so
+    e.g. a (100, 1, 1), (1, 100, 1) and (1, 1, 100) grid evaluates a million combinations at once.
+    """
+    f, b, c = np.asarray(fixture_multiplier), np.asarray(home_adv), np.asarray(difficulty_multiplier)
+
+    def at(key: str) -> np.ndarray:
+        return m[key][0] + f * m[key][1] + f ** 2 * m[key][2]
+
+    return (at('rr') - 2 * b * at('ru') - 2 * c * at('rv') + b ** 2 * at('uu') + 2 * b * c * at('uv')
+            + c ** 2 * at('vv'))
+
+
+def fit(obs: Observations, history_len: int, steps: int = 2001) -> tuple[ScoringParameters, float]:
+    """
+    Least-squares fit of the three multipliers. For every fixture multiplier on a grid that keeps all history
+    weights non-negative the best home advantage and difficulty multiplier solve a 2x2 linear system, so the
+    whole search is a handful of array operations. Returns the parameters and their root mean squared error.
+    """
+    m = moments(obs)
+    f = np.linspace(0, 1 / max(history_len, 1), steps)
+
+    def at(key: str) -> np.ndarray:
+        return m[key][0] + f * m[key][1] + f ** 2 * m[key][2]
+
+    normal = np.stack([np.stack([at('uu'), at('uv')], -1), np.stack([at('uv'), at('vv')], -1)], -2)
+    b, c = np.einsum('fij,fj->fi', np.linalg.pinv(normal), np.stack([at('ru'), at('rv')], -1)).T
+    errors = squared_errors(m, f, b, c)
+
+    best = int(errors.argmin())
+    params = ScoringParameters(float(f[best]), float(b[best]), float(c[best]))
+    return params, float(np.sqrt(max(errors[best], 0) / len(obs)))
+
+
+def rmse(obs: Observations, params: ScoringParameters) -> float:
+    errors = squared_errors(moments(obs), params.fixture_multiplier, params.home_adv, params.difficulty_multiplier)
+    return float(np.sqrt(max(errors, 0) / len(obs)))
+
+
+def calibrate(pl: PremierLeague, history_lens: list[int], first_gw: int = 2, last_gw: int | None = None) -> dict:
+    """Fits the multipliers for each history length and returns the best fit with its error and the defaults'"""
+    results = []
+    for history_len in history_lens:
+        obs = observations(pl, history_len, first_gw, last_gw)
+        params, error = fit(obs, history_len)
+        results.append({
+            **asdict(params),
+            'history_len': history_len,
+            'rmse': round(error, 4),
+            'default_rmse': round(rmse(obs, ScoringParameters()), 4),
+            'observations': len(obs)
+        })
+        print(f"History {history_len}: {params} RMSE {error:.4f} over {len(obs)} observations")
+    return min(results, key=lambda r: r['rmse'])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fit the expected points multipliers to the points actually scored")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--snapshot', default='data/snapshot.bin')
+    parser.add_argument('--history', type=int, nargs='+', default=[5, 10, 15], help="History lengths to compare")
+    parser.add_argument('--first', type=int, default=2, help="First gameweek to predict")
+    parser.add_argument('--last', type=int, help="Last gameweek to predict (defaults to the current one)")
+    parser.add_argument('--output', default=PARAMS_FILE, help="Where to write the fitted parameters")
+    args = parser.parse_args()
+
+    pl = snapshot.load_or_build_league(args.snapshot, args.data_dir)
+    start = time.perf_counter()
+    best = calibrate(pl, args.history, args.first, args.last)
+    print(f"Calibrated in {time.perf_counter() - start:.2f}s, best: {best}")
+
+    utils.write_to_json_file(args.output, best)
+
+
+if __name__ == '__main__':
+    main()
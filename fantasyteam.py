@@ -1,4 +1,7 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
+
+# Chips that may each be played once, at most one per gameweek
+CHIPS = ('wildcard', 'free_hit', 'bench_boost', 'triple_captain')
 
 
 @dataclass
@@ -10,9 +13,27 @@ class FantasyTeam:
     vice_captain: dict = field(default_factory=dict)
     transfers_in: dict = field(default_factory=dict)
     transfers_out: dict = field(default_factory=dict)
+    expected_points: dict = field(default_factory=dict)
+    chips: dict = field(default_factory=dict)
     bank: int = 0
     squad_value: int = 0
 
+    def copy(self) -> 'FantasyTeam':
+        """Copies every gameweek's containers so a solve on the copy leaves this team untouched"""
+        copied = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, dict):
+                value = {g: v.copy() if isinstance(v, (dict, list)) else v for g, v in value.items()}
+            copied[f.name] = value
+        return FantasyTeam(**copied)
+
+    def get_points(self, player, gw: int) -> float:
+        """Actual points for gameweeks that have been played, otherwise the model's expected points"""
+        if gw in player.points:
+            return sum(player.points[gw])
+        return self.expected_points.get(gw, {}).get(player.id, 0)
+
     def display_starting(self, gw: int) -> None:
         print("\nStarting 11:")
         self.starting[gw].sort(key=lambda x: self.players[gw].get(x).role)
@@ -20,14 +41,14 @@ class FantasyTeam:
             player = self.players[gw].get(p)
             captain = ' (C)' if self.captain[gw] == player else ''
             vice = ' (VC)' if self.vice_captain[gw] == player else ''
-            print(f"({player.role.name}) {player.name}{captain}{vice} ({sum(player.points[gw])})")
+            print(f"({player.role.name}) {player.name}{captain}{vice} ({self.get_points(player, gw)})")
 
     def display_bench(self, gw: int) -> None:
         print("\nBench:")
         self.bench[gw].sort(key=lambda x: self.players[gw].get(x).role)
         for p in self.bench.get(gw, []):
             player = self.players[gw].get(p)
-            print(f"({player.role.name}) {player.name} ({sum(player.points[gw])})")
+            print(f"({player.role.name}) {player.name} ({self.get_points(player, gw)})")
 
     def display_transfers_in(self, gw: int) -> None:
         print("\nTransfers In:")
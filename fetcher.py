@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+import utils
+from cache import HttpCache
+
+# Responses worth retrying: rate limited or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Spaces out request start times so that at most `rate` requests are started per second"""
+
+    def __init__(self, rate: float | None) -> None:
+        self.interval = 1 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BulkFetcher:
+    """
+    Fetches many JSON endpoints concurrently over a single pooled session.
+    Each response is written to its file as soon as it arrives, through the cache when one is given.
+    """
+
+    def __init__(self, workers: int = 8, rate_limit: float | None = 20, retries: int = 3, backoff: float = 0.5,
+                 timeout: float = 10, session: requests.Session | None = None, cache: HttpCache | None = None) -> None:
+        self.workers = workers
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate_limit)
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, url: str, headers: dict | None = None) -> requests.Response:
+        """Requests a single URL, retrying with exponential backoff on connection errors and retryable statuses"""
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+            except requests.exceptions.RequestException as e:
+                if attempt == self.retries or getattr(e.response, 'status_code', None) not in (None, *RETRY_STATUSES):
+                    raise SystemExit(e)
+
+            time.sleep(self.backoff * 2 ** attempt)
+
+    def fetch(self, url: str) -> dict:
+        return json.loads(self.request(url).text)
+
+    def fetch_to_file(self, filepath: str, url: str) -> dict:
+        if self.cache is not None:
+            return self.cache.load(filepath, url, self.request)
+
+        data = self.fetch(url)
+        utils.write_to_json_file(filepath, data)
+        return data
+
+    def fetch_all(self, jobs: dict) -> dict:
+        """
+        Fetches every job concurrently. jobs maps a key to a (filepath, url) pair and the parsed
+        response is returned under the same key.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.fetch_to_file, *job): key for key, job in jobs.items()}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        return results
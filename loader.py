@@ -0,0 +1,102 @@
+import utils
+from premierleague import Player, Club, Fixture, PremierLeague, Role
+from fantasyteam import FantasyTeam
+
+
+def get_current_gw(basic_data: dict) -> int:
+    for gw in basic_data['events']:
+        if gw['is_current']:
+            return gw['id']
+    return 0
+
+
+def build_league(basic_data: dict, fixture_data: list, player_data: dict) -> PremierLeague:
+    """Establishes club, player, and league instances from the API's JSON data"""
+    pl = PremierLeague()
+    pl.current_gw = get_current_gw(basic_data)
+
+    # Create club instances
+    for c in basic_data['teams']:
+        club = Club(c['id'], c['name'], c['short_name'], players={}, fixtures={})
+        pl.add_club(club)
+
+    # Attach fixtures to club instances
+    for f in fixture_data:
+        if f['event'] is None:
+            continue
+
+        fixture = Fixture(
+            f['id'], f['event'], f['team_h'], f['team_a'], f['team_h_difficulty'], f['team_a_difficulty']
+        )
+        pl.clubs[f['team_h']].add_fixture(fixture)
+        pl.clubs[f['team_a']].add_fixture(fixture)
+
+    # Create player instances
+    for p in basic_data['elements']:
+        player = Player(p['id'], p['first_name'], p['second_name'], p['team'], Role(p['element_type']))
+        player.cost = p['now_cost']
+        player.form = p['form']
+        player.points_per_game = p['points_per_game']
+        player.selected_by_percent = p['selected_by_percent']
+        player.total_points = p['total_points']
+        player.chance_of_playing = p['chance_of_playing_next_round']
+
+        add_history(player, player_data[p['id']])
+        pl.get_club(p['team']).add_player(player)
+
+    return pl
+
+
+def add_history(player: Player, summary: dict) -> None:
+    """Replaces the player's per-gameweek points and minutes with those of an element summary"""
+    player.points = {}
+    player.minutes = {}
+    for f in summary['history']:
+        player.add_gameweek_stat(f['round'], 'points', f['total_points'])
+        player.add_gameweek_stat(f['round'], 'minutes', f['minutes'])
+
+
+def build_team(pl: PremierLeague, my_team_data: dict, transfer_data: list) -> FantasyTeam:
+    """Populates a fantasy team instance with the current squad, bank, and transfer information"""
+    team = FantasyTeam()
+    players = pl.get_players()
+    team.bank = my_team_data['entry_history']['bank']
+    team.squad_value = my_team_data['entry_history']['value']
+    for p in my_team_data['picks']:
+        team.players.setdefault(pl.current_gw, {})[p['element']] = players.get(p['element'])
+
+        if p['position'] < 12:
+            # < 12 indicates played was in the starting eleven
+            team.starting.setdefault(pl.current_gw, []).append(p['element'])
+        else:
+            team.bench.setdefault(pl.current_gw, []).append(p['element'])
+
+        if p['is_captain']:
+            team.captain[pl.current_gw] = players[p['element']]
+        elif p['is_vice_captain']:
+            team.vice_captain[pl.current_gw] = players[p['element']]
+
+    for t in transfer_data:
+        if t['event'] == pl.current_gw:
+            # We use t['event'] to only save transfers from the current gameweek
+            team.transfers_in.setdefault(pl.current_gw, []).append(players[t['element_in']])
+            team.transfers_out.setdefault(pl.current_gw, []).append(players[t['element_out']])
+
+    return team
+
+
+def read_league_data(data_dir: str = 'data') -> tuple[dict, list, dict]:
+    """Reads the bootstrap, fixture and per-player JSON files previously fetched into data_dir"""
+    basic_data = utils.read_from_json_file(f'{data_dir}/basic.json')
+    fixture_data = utils.read_from_json_file(f'{data_dir}/fixtures.json')
+    player_data = {
+        p['id']: utils.read_from_json_file(f'{data_dir}/players/{p["id"]}.json') for p in basic_data['elements']
+    }
+    return basic_data, fixture_data, player_data
+
+
+def read_team(pl: PremierLeague, data_dir: str = 'data') -> FantasyTeam:
+    """Builds the fantasy team from the my_team and my_transfers JSON files in data_dir"""
+    my_team_data = utils.read_from_json_file(f'{data_dir}/my_team.json')
+    transfer_data = utils.read_from_json_file(f'{data_dir}/my_transfers.json')
+    return build_team(pl, my_team_data, transfer_data)
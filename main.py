@@ -1,17 +1,43 @@
-import utils
-from premierleague import Player, Club, Fixture, PremierLeague, Role
-from fantasyteam import FantasyTeam
-from model import FantasyModel
+import argparse
+import os
+import sys
+import time
 
+# Taken before anything heavy is imported, so the startup budget covers every import the command makes
+START = time.perf_counter()
 
 MANAGER_ID = "6082478"
 BASE_URL = "https://fantasy.premierleague.com/api/"
 BASIC_DATA_URL = "bootstrap-static/"
 FIXTURES_URL = "fixtures/"
 
-REFRESH = False
 HORIZON_LENGTH = 10
-PAST_GAMEWEEKS = 10
+
+# Concurrent requests and maximum requests per second used when refreshing player summaries
+FETCH_WORKERS = 8
+FETCH_RATE_LIMIT = 20
+
+# Validators and fetch times of everything in data/, so a refresh only downloads what has changed
+CACHE_INDEX = 'data/cache.json'
+
+# Columnar copy of the league data used by sweep.py, rebuilt whenever the JSON data changes
+SNAPSHOT = 'data/snapshot.bin'
+
+# Built league and team keyed by the hash of every input file, so unchanged data is never parsed again
+BUILD_CACHE = 'data/build.pkl'
+
+# Last solved plan, used as a MIP start for the next run
+PLAN_FILE = 'data/plan.json'
+
+# Per-phase timings, memory and model/solver statistics of the last run
+REPORT_FILE = 'data/report.json'
+
+# Seconds commands that never solve may take, including imports, and the modules they must not import
+STARTUP_BUDGET = {'show': 0.5, 'load': 2.0}
+HEAVY_MODULES = ('pulp', 'scipy', 'requests')
+
+# The only heavy module optimise may import, by backend
+SOLVER_MODULES = {'pulp': 'pulp', 'highs': 'scipy'}
 
 
 def get_player_summary_url(player_id: int) -> str:
@@ -26,113 +52,177 @@ def get_my_team_url(manager_id: str, gameweek: int) -> str:
     return f"entry/{manager_id}/event/{gameweek}/picks/"
 
 
-def load_data(filepath: str, url: str, refresh: bool = False) -> dict:
-    """Fetches data from the API or loads it from a JSON file"""
-    data = {}
-    print(f"Loading data: {url}...")
-    if refresh:
-        # Fetch from API
-        data = utils.fetch_data(url)
-        utils.write_to_json_file(filepath, data)
-        return data
-
-    # Read from JSON file
-    return utils.read_from_json_file(filepath)
-
-
-# --------------------
-# Load Data
-# --------------------
-basic_data = load_data('data/basic.json', BASE_URL + BASIC_DATA_URL, refresh=REFRESH)
-fixture_data = load_data('data/fixtures.json', BASE_URL + FIXTURES_URL, refresh=REFRESH)
-transfer_data = load_data('data/my_transfers.json', BASE_URL + get_my_transfers_url(MANAGER_ID), refresh=REFRESH)
-
-player_data = {}
-for player in basic_data['elements']:
-    id = player['id']
-    player_data[id] = load_data(f'data/players/{id}.json', BASE_URL + get_player_summary_url(id), refresh=REFRESH)
-
-# Set the current gameweek
-current_gw = 0
-for gw in basic_data['events']:
-    if gw['is_current']:
-        current_gw = gw['id']
-        break
-
-my_team_data = load_data('data/my_team.json', BASE_URL + get_my_team_url(MANAGER_ID, current_gw), refresh=REFRESH)
-
-# --------------------
-# Establish club, player, and league instances
-# --------------------
-
-pl = PremierLeague()
-pl.current_gw = current_gw
-
-# Create club instances
-for c in basic_data['teams']:
-    club = Club(c['id'], c['name'], c['short_name'], players={}, fixtures={})
-    pl.add_club(club)
-
-# Attach fixtures to club instances
-for f in fixture_data:
-    if f['event'] is None:
-        continue
-
-    fixture = Fixture(f['id'], f['event'], f['team_h'], f['team_a'], f['team_h_difficulty'], f['team_a_difficulty'])
-    pl.clubs[f['team_h']].add_fixture(fixture)
-    pl.clubs[f['team_a']].add_fixture(fixture)
-
-# Create player instances
-for p in basic_data['elements']:
-    player = Player(p['id'], p['first_name'], p['second_name'], p['team'], Role(p['element_type']))
-    player.cost = p['now_cost']
-    player.form = p['form']
-    player.points_per_game = p['points_per_game']
-    player.selected_by_percent = p['selected_by_percent']
-    player.total_points = p['total_points']
-    player.chance_of_playing = p['chance_of_playing_next_round']
-
-    for f in player_data[p['id']]['history']:
-        player.add_gameweek_stat(f['round'], 'points', f['total_points'])
-        player.add_gameweek_stat(f['round'], 'minutes', f['minutes'])
-
-    pl.get_club(p['team']).add_player(player)
-
-# --------------------
-# Populate fantasy team instance with current squad, bank, and transfer information
-# --------------------
-
-team = FantasyTeam()
-players = pl.get_players()
-team.bank = my_team_data['entry_history']['bank']
-team.squad_value = my_team_data['entry_history']['value']
-for p in my_team_data['picks']:
-    team.players.setdefault(pl.current_gw, {})[p['element']] = players.get(p['element'])
-
-    if p['position'] < 12:
-        # < 12 indicates played was in the starting eleven
-        team.starting.setdefault(pl.current_gw, []).append(p['element'])
-    else:
-        team.bench.setdefault(pl.current_gw, []).append(p['element'])
-
-    if p['is_captain']:
-        team.captain[pl.current_gw] = players[p['element']]
-    elif p['is_vice_captain']:
-        team.vice_captain[pl.current_gw] = players[p['element']]
-
-for t in transfer_data:
-    if t['event'] == pl.current_gw:
-        # We use t['event'] to only save transfers from the current gameweek
-        team.transfers_in.setdefault(pl.current_gw, []).append(players[t['element_in']])
-        team.transfers_out.setdefault(pl.current_gw, []).append(players[t['element_out']])
-
-
-model = FantasyModel(pl, team)
-model.solve(HORIZON_LENGTH, PAST_GAMEWEEKS)
-
-if model.status == 'Infeasible':
-    print("Problem is infeasible")
-else:
-    for gw in range(pl.current_gw, pl.current_gw + model.horizon_len + 1):
+def refresh(args: argparse.Namespace) -> None:
+    """Fetches everything that changed from the API into data/ and rewrites the snapshot"""
+    import snapshot
+    from cache import HttpCache
+    from fetcher import BulkFetcher
+    from loader import get_current_gw
+
+    cache = HttpCache(CACHE_INDEX)
+
+    def load_data(filepath: str, url: str) -> dict:
+        # Fetch from API unless the cached copy is still fresh or the server reports it unchanged
+        print(f"Loading data: {url}...")
+        return cache.load(filepath, url)
+
+    basic_data = load_data('data/basic.json', BASE_URL + BASIC_DATA_URL)
+    fixture_data = load_data('data/fixtures.json', BASE_URL + FIXTURES_URL)
+
+    print(f"Fetching {len(basic_data['elements'])} player summaries...")
+    fetcher = BulkFetcher(workers=args.workers, rate_limit=args.rate_limit, cache=cache)
+    player_data = fetcher.fetch_all({
+        p['id']: (f'data/players/{p["id"]}.json', BASE_URL + get_player_summary_url(p['id']))
+        for p in basic_data['elements']
+    })
+
+    print(f"Writing snapshot: {SNAPSHOT}...")
+    snapshot.write_snapshot(SNAPSHOT, basic_data, fixture_data, player_data)
+
+    load_data('data/my_transfers.json', BASE_URL + get_my_transfers_url(args.manager))
+    load_data('data/my_team.json', BASE_URL + get_my_team_url(args.manager, get_current_gw(basic_data)))
+
+    cache.save()
+    print(f"Cache: {cache.stats}")
+
+
+def load(args: argparse.Namespace) -> None:
+    """Builds the league and team into the build cache, rebuilding only what changed, and shows the squad"""
+    import buildcache
+
+    pl, team = buildcache.load_or_build(BUILD_CACHE)
+    print(f"Gameweek {pl.current_gw}: {len(pl.get_players())} players, bank {team.bank}")
+    team.display_squad(pl.current_gw)
+
+
+def optimise(args: argparse.Namespace) -> None:
+    """Solves the model over the horizon, then saves and shows the plan"""
+    import buildcache
+    import plan
+    from model import FantasyModel
+    from scoring import load_calibration
+    from solver import SolverConfig
+    from stochastic import RiskConfig
+
+    # Loads the built league and team, rebuilding only what changed in the JSON data
+    pl, team = buildcache.load_or_build(BUILD_CACHE)
+
+    config = SolverConfig(args.backend, args.solver, args.threads, args.time_limit, args.gap, msg=not args.quiet)
+    risk = None
+    if args.risk:
+        risk = RiskConfig(args.samples, args.risk, args.risk_aversion, args.alpha)
+    params, history_len = load_calibration()
+    history_len = args.history if args.history is not None else history_len
+
+    horizon = range(pl.current_gw, pl.current_gw + args.horizon + 1)
+    warm_start = None
+    if not args.no_warm_start and os.path.exists(PLAN_FILE):
+        warm_start = plan.shift_plan(plan.load_plan(PLAN_FILE), horizon)
+
+    model = FantasyModel(pl, team, params)
+    model.solve(args.horizon, history_len, prune=args.prune, config=config, warm_start=warm_start,
+                track_memory=args.track_memory, risk=risk, compact=args.compact,
+                chips=tuple(args.chips) if args.chips is not None else None)
+    model.report.to_json(REPORT_FILE)
+    print(f"Phase timings: {model.timings}")
+
+    if model.plan is None:
+        sys.exit(f"No plan found: {model.solution_status}")
+
+    print(f"{model.solution_status} (gap {model.gap})")
+    if model.chips:
+        print(f"Chips: {model.chips}")
+    plan.save_plan(PLAN_FILE, team, horizon)
+    for gw in horizon:
         print(f"\n------------\nGameweek: {gw}\n------------")
         team.display_gameweek(gw)
+
+
+def show(args: argparse.Namespace) -> None:
+    """Shows the last saved plan from the build cache, without importing the solver or rebuilding anything"""
+    import buildcache
+    import plan
+
+    cached = buildcache.read_cache(BUILD_CACHE)
+    if cached is None or not os.path.exists(PLAN_FILE):
+        sys.exit("Nothing to show yet, run the load and optimise commands first")
+
+    saved = plan.load_plan(PLAN_FILE)
+    team = plan.team_from_plan(saved, cached['league'])
+    for gw in sorted(saved):
+        if args.gameweek is not None and gw != args.gameweek:
+            continue
+        chip = f" ({team.chips[gw]})" if gw in team.chips else ''
+        print(f"\n------------\nGameweek: {gw}{chip}\n------------")
+        team.display_gameweek(gw)
+
+
+def check_startup(args: argparse.Namespace) -> bool:
+    """
+    Reports the command's wall time and any heavy modules it imported without needing them, returning whether it
+    stayed in budget. optimise has no time budget but may only import its own backend's solver.
+    """
+    elapsed = time.perf_counter() - START
+    needed = {SOLVER_MODULES[args.backend]} if args.command == 'optimise' else set()
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules and name not in needed]
+    budget = STARTUP_BUDGET.get(args.command)
+    limit = f" (budget {budget}s)" if budget is not None else ''
+    print(f"{args.command}: {elapsed:.3f}s{limit}, unneeded heavy modules loaded: {heavy or 'none'}", file=sys.stderr)
+    if budget is None and args.command != 'optimise':
+        return True
+    return (budget is None or elapsed <= budget) and not heavy
+
+
+def main() -> None:
+    from fantasyteam import CHIPS
+
+    parser = argparse.ArgumentParser(description="Fantasy Premier League transfer planner")
+    parser.add_argument('--check-startup', action='store_true',
+                        help="Report the command's time and heavy imports, failing when over its startup budget")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_refresh = commands.add_parser('refresh', help="Fetch changed data from the API")
+    parser_refresh.add_argument('--manager', default=MANAGER_ID, help="Manager (entry) id whose team is fetched")
+    parser_refresh.add_argument('--workers', type=int, default=FETCH_WORKERS)
+    parser_refresh.add_argument('--rate-limit', type=float, default=FETCH_RATE_LIMIT, help="Requests per second")
+    parser_refresh.set_defaults(run=refresh)
+
+    parser_load = commands.add_parser('load', help="Build the league and team from data/ and show the squad")
+    parser_load.set_defaults(run=load)
+
+    parser_optimise = commands.add_parser('optimise', help="Solve the transfer plan over the horizon")
+    parser_optimise.add_argument('--horizon', type=int, default=HORIZON_LENGTH)
+    parser_optimise.add_argument('--history', type=int, help="Gameweeks of history (defaults to the calibrated one)")
+    parser_optimise.add_argument('--backend', choices=['pulp', 'highs'], default='pulp')
+    parser_optimise.add_argument('--solver', default='PULP_CBC_CMD', help="PuLP solver name for the pulp backend")
+    parser_optimise.add_argument('--threads', type=int)
+    parser_optimise.add_argument('--time-limit', type=float, help="Use the best plan found within this many seconds")
+    parser_optimise.add_argument('--gap', type=float, help="Relative MIP gap at which the plan is good enough")
+    parser_optimise.add_argument('--quiet', action='store_true',
+                                 help="Hide the solver log, letting the pulp backend report CBC's statistics")
+    parser_optimise.add_argument('--prune', action='store_true', help="Leave out dominated players (heuristic)")
+    parser_optimise.add_argument('--compact', action='store_true', help="Solve the compact formulation (highs)")
+    parser_optimise.add_argument('--chips', nargs='*', choices=CHIPS, help="Chips still available to plan (highs)")
+    parser_optimise.add_argument('--risk', choices=['mean', 'mean_std', 'cvar'],
+                                 help="Optimise sampled, risk-adjusted points with this measure")
+    parser_optimise.add_argument('--samples', type=int, default=1000)
+    parser_optimise.add_argument('--risk-aversion', type=float, default=1.0)
+    parser_optimise.add_argument('--alpha', type=float, default=0.2)
+    parser_optimise.add_argument('--track-memory', action='store_true',
+                                 help="Trace peak Python memory per phase (slows the build and solve)")
+    parser_optimise.add_argument('--no-warm-start', action='store_true', help="Ignore the last saved plan")
+    parser_optimise.set_defaults(run=optimise)
+
+    parser_show = commands.add_parser('show', help="Show the last saved plan")
+    parser_show.add_argument('--gameweek', type=int, help="Only show this gameweek")
+    parser_show.set_defaults(run=show)
+
+    args = parser.parse_args()
+    args.run(args)
+
+    if args.check_startup and not check_startup(args):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,444 @@
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import csr_array, vstack
+from fantasyteam import CHIPS, FantasyTeam
+from plan import FAMILIES
+from solver import STATUS, highs_solution_status
+
+
+class ConstraintRows:
+    """
+    Accumulates blocks of linear constraints as COO triplets.
+    Each block is k constraints of m terms given as (k, m) arrays of column indices and coefficients.
+    """
+
+    def __init__(self) -> None:
+        self.rows, self.cols, self.vals, self.lower, self.upper = [], [], [], [], []
+        self.count = 0
+        self.families = {}
+
+    def add(self, family: str, cols: np.ndarray, vals, lower, upper) -> None:
+        cols = np.atleast_2d(cols)
+        k, m = cols.shape
+        self.families.setdefault(family, []).extend(range(self.count, self.count + k))
+        self.rows.append(np.repeat(np.arange(self.count, self.count + k), m))
+        self.cols.append(cols.ravel())
+        self.vals.append(np.broadcast_to(vals, (k, m)).ravel())
+        self.lower.append(np.broadcast_to(lower, (k,)))
+        self.upper.append(np.broadcast_to(upper, (k,)))
+        self.count += k
+
+    def build(self, n_vars: int) -> tuple[csr_array, np.ndarray, np.ndarray]:
+        """The sparse coefficient matrix with the lower and upper bound of each row"""
+        A = csr_array(
+            (np.concatenate(self.vals).astype(float), (np.concatenate(self.rows), np.concatenate(self.cols))),
+            shape=(self.count, n_vars)
+        )
+        return A, np.concatenate(self.lower).astype(float), np.concatenate(self.upper).astype(float)
+
+
+def add_selection_limits(rows: ConstraintRows, per_gw, players: list, clubs: list, n_r: dict, l_r: dict,
+                         u_r: dict) -> None:
+    """Adds the role and club limits on the squad (z) and starting 11 (x) shared by both formulations"""
+    # Squad size and starting 11 limits for each role
+    roles = np.array([p.role.value for p in players])
+    for r in n_r:
+        members = roles == r.value
+        rows.add('role_squad', per_gw('z', members), 1, n_r[r], n_r[r])
+        rows.add('role_starting', per_gw('x', members), 1, l_r[r], u_r[r])
+
+    # Max 3 players from each club
+    club_ids = np.array([p.club_id for p in players])
+    for club in clubs:
+        members = club_ids == club.id
+        if members.any():
+            rows.add('club_limit', per_gw('z', members), 1, -np.inf, 3)
+
+
+class MatrixModel:
+    """
+    The FantasyModel formulation assembled directly as sparse coefficient arrays and solved in-process
+    by HiGHS through scipy.optimize.milp, without PuLP objects, constraint names or temp files.
+    """
+
+    # Per player and gameweek families laid out in the solution vector; subclasses may model fewer
+    FAMILIES = FAMILIES
+
+    def __init__(self, players: list, clubs: list, gameweeks: range, team: FantasyTeam, scores: np.ndarray,
+                 n_r: dict, l_r: dict, u_r: dict) -> None:
+        self.players = players
+        self.gameweeks = gameweeks
+        self.team = team
+
+        n_p, n_g = len(players), len(gameweeks)
+        block = n_p * n_g
+        self.shape = (n_p, n_g)
+        self.future = np.arange(1, n_g)
+
+        # Column of family f for player i in gameweek j is f * block + i * n_g + j, followed by zero_t[j]
+        grid = np.arange(block).reshape(n_p, n_g)
+        self.var = {f: k * block + grid for k, f in enumerate(self.FAMILIES)}
+        self.zero_t = len(self.FAMILIES) * block + np.arange(n_g)
+        self.n_vars = self.zero_t[-1] + 1
+        self.integrality = np.ones(self.n_vars)
+
+        # ----------------------------------------
+        # Objective (scipy minimises)
+        # --------------------------------------
+        self.c = np.zeros(self.n_vars)
+        self.set_scores(slice(None), scores)
+
+        # ----------------------------------------
+        # Bounds: pin the current gameweek to the actual team
+        # --------------------------------------
+        self.lb = np.zeros(self.n_vars)
+        self.ub = np.ones(self.n_vars)
+        self.pin_current_gameweek()
+
+        # ----------------------------------------
+        # Constraints for every future gameweek
+        # --------------------------------------
+        rows = ConstraintRows()
+        self.add_rows(rows)
+        add_selection_limits(rows, self.per_gw, players, clubs, n_r, l_r, u_r)
+
+        self.A, self.row_lb, self.row_ub = rows.build(self.n_vars)
+        self.family_rows = {family: np.array(indices) for family, indices in rows.families.items()}
+        self.stats = self.model_stats()
+
+    def pin_current_gameweek(self) -> None:
+        """Fixes every modelled family in the current gameweek to the actual team, with no transfer rolled over"""
+        team, g = self.team, self.gameweeks.start
+        ids = np.array([p.id for p in self.players])
+        current = {
+            'x': np.isin(ids, team.starting.get(g, [])),
+            'y': np.isin(ids, team.bench.get(g, [])),
+            'z': np.isin(ids, list(team.players[g])),
+            't_in': np.isin(ids, [p.id for p in team.transfers_in.get(g, [])]),
+            't_out': np.isin(ids, [p.id for p in team.transfers_out.get(g, [])]),
+            'cc': ids == team.captain[g].id,
+            'vc': ids == team.vice_captain[g].id
+        }
+        for f in self.FAMILIES:
+            self.lb[self.var[f][:, 0]] = current[f]
+            self.ub[self.var[f][:, 0]] = current[f]
+        self.ub[self.zero_t[0]] = 0
+
+    def per_gw(self, f: str, subset=slice(None)) -> np.ndarray:
+        """(gameweeks, players) columns of family f for each future gameweek"""
+        return self.var[f][subset][:, self.future].T
+
+    def per_player(self, *families: str) -> np.ndarray:
+        """(players * gameweeks, terms) columns pairing the given families in each future gameweek"""
+        return np.stack([self.var[f][:, self.future].ravel() for f in families], axis=1)
+
+    def add_rows(self, rows: ConstraintRows) -> None:
+        """Adds the constraints of every future gameweek other than the role and club limits"""
+        n_p = self.shape[0]
+        var, zero_t, future = self.var, self.zero_t, self.future
+
+        # Must have a captain and a vice captain selected
+        rows.add('captain', self.per_gw('cc'), 1, 1, 1)
+        rows.add('vice_captain', self.per_gw('vc'), 1, 1, 1)
+
+        # Squad value must be within our budget
+        costs = np.array([p.cost for p in self.players])
+        rows.add('budget', self.per_gw('z'), costs, -np.inf, self.team.squad_value)
+
+        # Calculate whether any transfers occurred in the previous gameweek
+        previous = np.hstack([var['t_in'][:, future - 1].T, zero_t[future, None]])
+        rows.add('previous_transfers', previous, np.append(np.ones(n_p), 2), -np.inf, 2)
+
+        # Maximum of 2 free transfers in and out of the team during each gameweek
+        for f in ('t_in', 't_out'):
+            rows.add(f'max_{f}', np.hstack([self.per_gw(f), zero_t[future, None]]), np.append(np.ones(n_p), -1),
+                     -np.inf, 1)
+
+        # Number of transfers in must match the number of transfers out
+        rows.add('transfer_balance', np.hstack([self.per_gw('t_in'), self.per_gw('t_out')]), np.repeat([1, -1], n_p),
+                 0, 0)
+
+        # Starting 11 must have 11 players
+        rows.add('starting_11', self.per_gw('x'), 1, 11, 11)
+
+        # Player is in the squad of 15, cannot be captain and vice captain, and must start if (vice) captain
+        rows.add('squad', self.per_player('x', 'y', 'z'), [1, 1, -1], 0, 0)
+        rows.add('captain_or_vice', self.per_player('cc', 'vc'), 1, -np.inf, 1)
+        rows.add('captain_starts', self.per_player('x', 'cc'), [1, -1], 0, np.inf)
+        rows.add('vice_captain_starts', self.per_player('x', 'vc'), [1, -1], 0, np.inf)
+
+        # Player cannot be transferred in and out in the same gameweek
+        rows.add('transfer_in_or_out', self.per_player('t_in', 't_out'), 1, -np.inf, 1)
+
+        # Track each player's transfers based on the previous gameweek's selection
+        tracking = np.stack([
+            var['z'][:, future].ravel(), var['z'][:, future - 1].ravel(),
+            var['t_out'][:, future].ravel(), var['t_in'][:, future].ravel()
+        ], axis=1)
+        rows.add('transfer_tracking', tracking, [1, -1, 1, -1], 0, 0)
+
+    def model_stats(self, **variables: int) -> dict:
+        """Variables per family, including any given extra ones, constraints per family and nonzeros"""
+        n_p, n_g = self.shape
+        return {
+            'variables': {**{f: n_p * n_g for f in self.FAMILIES}, 'zero_t': n_g, **variables},
+            'constraints': {family: len(indices) for family, indices in self.family_rows.items()},
+            'nonzeros': self.A.nnz
+        }
+
+    @property
+    def player_families(self) -> tuple[str, ...]:
+        """Families with a column for every player and gameweek"""
+        return self.FAMILIES
+
+    def set_scores(self, players, scores: np.ndarray) -> None:
+        """Sets the objective coefficients of the given player rows from their expected points"""
+        self.c[self.var['x'][players]] = -scores
+        self.c[self.var['y'][players]] = -0.1 * scores
+        self.c[self.var['cc'][players]] = -scores
+
+    def set_selection(self, player: int, lower: int, upper: int) -> None:
+        """Bounds whether the player at the given row is in the squad in every future gameweek"""
+        self.lb[self.var['z'][player, 1:]] = lower
+        self.ub[self.var['z'][player, 1:]] = upper
+
+    def set_budget(self, value: int) -> None:
+        """Sets the squad value available in every future gameweek"""
+        self.row_ub[self.family_rows['budget']] = value
+
+    def solve(self, options: dict | None = None, relax: bool = False) -> None:
+        """
+        Solves with the given scipy.optimize.milp options, keeping the best solution found within any limits.
+        relax solves the LP relaxation instead, for its bound only.
+        """
+        result = milp(
+            self.c,
+            integrality=np.zeros(self.n_vars) if relax else self.integrality,
+            bounds=Bounds(self.lb, self.ub),
+            constraints=LinearConstraint(self.A, self.row_lb, self.row_ub),
+            options=options
+        )
+        self.solution_status = highs_solution_status(result.status, result.x is not None)
+        self.status = STATUS[self.solution_status]
+        self.objective_value = -result.fun if result.x is not None else None
+        self.solver_stats = {
+            'result': result.message,
+            'nodes': getattr(result, 'mip_node_count', None),
+            'gap': getattr(result, 'mip_gap', None),
+            'best_bound': -result.mip_dual_bound if getattr(result, 'mip_dual_bound', None) is not None else None,
+            # scipy does not report when the first incumbent was found
+            'time_to_first_incumbent': None,
+            'solver_seconds': None
+        }
+        self.solution = None
+        if result.x is not None and not relax:
+            self.solution = self.read_solution(result.x > 0.5)
+
+    def read_solution(self, values: np.ndarray) -> dict:
+        """Boolean (players, gameweeks) arrays of each variable family"""
+        return {f: values[self.var[f]] for f in FAMILIES}
+
+
+class CompactMatrixModel(MatrixModel):
+    """
+    An equivalent, smaller formulation. The bench is z - x, so y is dropped and the bench's points move onto
+    x and z. The vice captain earns nothing, so vc is dropped and the best non-captain starter is named after
+    solving. Captaincy is limited to the starting 11 and so to squad members. Transfers out always match
+    transfers in because the squad size is fixed, so t_out is dropped. t_in is continuous with
+    t_in >= z[g] - z[g - 1], which is exact at every integer point since t_in only appears in upper limits.
+    """
+
+    FAMILIES = ('x', 'z', 't_in', 'cc')
+
+    def __init__(self, players: list, clubs: list, gameweeks: range, team: FantasyTeam, scores: np.ndarray,
+                 n_r: dict, l_r: dict, u_r: dict) -> None:
+        # Kept for naming the vice captain after solving
+        self.scores = scores
+        super().__init__(players, clubs, gameweeks, team, scores, n_r, l_r, u_r)
+        self.integrality[self.var['t_in']] = 0
+
+    def add_rows(self, rows: ConstraintRows) -> None:
+        n_p = self.shape[0]
+        var, zero_t, future = self.var, self.zero_t, self.future
+
+        # Must have a captain selected
+        rows.add('captain', self.per_gw('cc'), 1, 1, 1)
+
+        # Squad value must be within our budget
+        costs = np.array([p.cost for p in self.players])
+        rows.add('budget', self.per_gw('z'), costs, -np.inf, self.team.squad_value)
+
+        # Calculate whether any transfers occurred in the previous gameweek
+        previous = np.hstack([var['t_in'][:, future - 1].T, zero_t[future, None]])
+        rows.add('previous_transfers', previous, np.append(np.ones(n_p), 2), -np.inf, 2)
+
+        # Maximum of 2 free transfers during each gameweek
+        rows.add('max_t_in', np.hstack([self.per_gw('t_in'), zero_t[future, None]]), np.append(np.ones(n_p), -1),
+                 -np.inf, 1)
+
+        # Starting 11 must have 11 players
+        rows.add('starting_11', self.per_gw('x'), 1, 11, 11)
+
+        # Starters are in the squad and the captain starts
+        rows.add('starts_in_squad', self.per_player('z', 'x'), [1, -1], 0, np.inf)
+        rows.add('captain_starts', self.per_player('x', 'cc'), [1, -1], 0, np.inf)
+
+        # A player is transferred in when they join the squad
+        tracking = np.stack([
+            var['t_in'][:, future].ravel(), var['z'][:, future].ravel(), var['z'][:, future - 1].ravel()
+        ], axis=1)
+        rows.add('transfer_tracking', tracking, [1, -1, 1], 0, np.inf)
+
+    def set_scores(self, players, scores: np.ndarray) -> None:
+        """Sets the objective coefficients of the given player rows, with the bench's share carried by z"""
+        self.scores[players] = scores
+        self.c[self.var['x'][players]] = -0.9 * scores
+        self.c[self.var['z'][players]] = -0.1 * scores
+        self.c[self.var['cc'][players]] = -scores
+
+    def read_solution(self, values: np.ndarray) -> dict:
+        """Derives the dropped families so the solution has the same shape as MatrixModel's"""
+        x, z, cc = values[self.var['x']], values[self.var['z']], values[self.var['cc']]
+        previous = np.hstack([z[:, :1], z[:, :-1]])
+
+        # The vice captain is the highest scoring starter other than the captain
+        vc = np.zeros_like(x)
+        candidates = np.where(x & ~cc, self.scores, -np.inf)
+        best = candidates.argmax(axis=0)
+        vc[best, np.arange(x.shape[1])] = True
+
+        return {
+            'x': x, 'y': z & ~x, 'z': z, 't_in': z & ~previous, 't_out': previous & ~z, 'cc': cc, 'vc': vc
+        }
+
+
+class ChipMatrixModel(MatrixModel):
+    """
+    The full formulation with one binary per chip and gameweek, so the chip calendar is chosen in the same
+    solve as the transfers. A wildcard or free hit lifts the transfer limits of its gameweek, and no transfer
+    is rolled over after either. Transfers are tracked against a base squad zb, which follows z except in a
+    free hit week where it keeps the previous squad, so the free hit squad reverts the following week. A bench
+    boost scores the bench in full and a triple captain scores the captain three times, through continuous
+    bb_points and tc_points bounded by both the selection and the chip. available lists the chips left to play.
+    """
+
+    def __init__(self, players: list, clubs: list, gameweeks: range, team: FantasyTeam, scores: np.ndarray,
+                 n_r: dict, l_r: dict, u_r: dict, available: tuple[str, ...] = CHIPS) -> None:
+        unknown = set(available) - set(CHIPS)
+        if unknown:
+            raise ValueError(f"Unknown chips {sorted(unknown)}, expected some of {CHIPS}")
+        super().__init__(players, clubs, gameweeks, team, scores, n_r, l_r, u_r)
+        n_p, n_g = self.shape
+        block = n_p * n_g
+        var, zero_t, future = self.var, self.zero_t, self.future
+
+        # Columns of zb, bb_points and tc_points follow zero_t, then one column per chip and gameweek
+        grid = np.arange(block).reshape(n_p, n_g)
+        for k, f in enumerate(('zb', 'bb_points', 'tc_points')):
+            var[f] = self.n_vars + k * block + grid
+        chip = self.n_vars + 3 * block + np.arange(len(CHIPS) * n_g).reshape(len(CHIPS), n_g)
+        self.chip_var = dict(zip(CHIPS, chip))
+        wildcard, free_hit = self.chip_var['wildcard'], self.chip_var['free_hit']
+
+        n_new = 3 * block + chip.size
+        self.n_vars += n_new
+        self.integrality = np.append(self.integrality, np.ones(n_new))
+        self.integrality[var['bb_points']] = 0
+        self.integrality[var['tc_points']] = 0
+        self.c = np.append(self.c, np.zeros(n_new))
+        self.lb = np.append(self.lb, np.zeros(n_new))
+        self.ub = np.append(self.ub, np.ones(n_new))
+        self.set_scores(slice(None), scores)
+
+        # The current gameweek's base squad is the actual squad and no chip is played in it
+        self.lb[var['zb'][:, 0]] = self.ub[var['zb'][:, 0]] = self.lb[var['z'][:, 0]]
+        self.ub[var['bb_points'][:, 0]] = self.ub[var['tc_points'][:, 0]] = 0
+        self.ub[chip[:, 0]] = 0
+        for name, columns in self.chip_var.items():
+            if name not in available:
+                self.ub[columns] = 0
+
+        # ----------------------------------------
+        # Amend the base rows
+        # --------------------------------------
+        extra_rows, extra_cols, extra_vals = [], [], []
+
+        def amend(family: str, cols: np.ndarray, vals) -> None:
+            """Adds terms to each row of the family, given as (rows, terms) columns and coefficients"""
+            extra_rows.append(np.repeat(self.family_rows[family], cols.shape[1]))
+            extra_cols.append(cols.ravel())
+            extra_vals.append(np.broadcast_to(vals, cols.shape).ravel())
+
+        # A wildcard or free hit allows any number of transfers
+        for f in ('max_t_in', 'max_t_out'):
+            amend(f, np.stack([wildcard[future], free_hit[future]], axis=1), -15)
+        amend('previous_transfers', np.stack([wildcard[future - 1], free_hit[future - 1]], axis=1), -15)
+
+        # Track transfers against the previous base squad instead of the previous squad
+        previous = np.stack([var['z'][:, future - 1].ravel(), var['zb'][:, future - 1].ravel()], axis=1)
+        amend('transfer_tracking', previous, [1, -1])
+
+        self.A = csr_array((self.A.data, self.A.indices, self.A.indptr), shape=(self.A.shape[0], self.n_vars))
+        self.A = self.A + csr_array(
+            (np.concatenate(extra_vals), (np.concatenate(extra_rows), np.concatenate(extra_cols))), shape=self.A.shape
+        )
+        self.A.eliminate_zeros()
+
+        # ----------------------------------------
+        # Chip constraints for every future gameweek
+        # --------------------------------------
+        rows = ConstraintRows()
+
+        def pair(*columns: np.ndarray) -> np.ndarray:
+            """(players * gameweeks, terms) columns pairing (players, future gameweeks) or (future gameweeks) columns"""
+            return np.stack([np.broadcast_to(c, (n_p, len(future))).ravel() for c in columns], axis=1)
+
+        # Each chip is played at most once and at most one chip is played in a gameweek
+        rows.add('chip_once', chip[:, future], 1, -np.inf, 1)
+        rows.add('chip_per_gameweek', chip[:, future].T, 1, -np.inf, 1)
+
+        # No transfer is rolled over into the gameweek after a wildcard or free hit
+        rows.add('chip_rollover', np.stack([zero_t[future], wildcard[future - 1], free_hit[future - 1]], axis=1), 1,
+                 -np.inf, 1)
+
+        # The base squad is the squad unless a free hit is played, in which case it is last week's base squad
+        zb, z = var['zb'][:, future], var['z'][:, future]
+        rows.add('free_hit_squad', pair(zb, z, free_hit[future]), [1, -1, -1], -np.inf, 0)
+        rows.add('free_hit_squad', pair(z, zb, free_hit[future]), [1, -1, -1], -np.inf, 0)
+        rows.add('free_hit_base', pair(zb, var['zb'][:, future - 1], free_hit[future]), [1, -1, 1], -np.inf, 1)
+        rows.add('free_hit_base', pair(var['zb'][:, future - 1], zb, free_hit[future]), [1, -1, 1], -np.inf, 1)
+
+        # Bench boost points need the player on the bench and triple captain points need them as captain
+        bench_boost, triple_captain = self.chip_var['bench_boost'], self.chip_var['triple_captain']
+        rows.add('bench_boost', pair(var['bb_points'][:, future], var['y'][:, future]), [1, -1], -np.inf, 0)
+        rows.add('bench_boost', pair(var['bb_points'][:, future], bench_boost[future]), [1, -1], -np.inf, 0)
+        rows.add('triple_captain', pair(var['tc_points'][:, future], var['cc'][:, future]), [1, -1], -np.inf, 0)
+        rows.add('triple_captain', pair(var['tc_points'][:, future], triple_captain[future]), [1, -1], -np.inf,
+                 0)
+
+        A, row_lb, row_ub = rows.build(self.n_vars)
+        offset = self.A.shape[0]
+        self.A = vstack([self.A, A], format='csr')
+        self.row_lb = np.append(self.row_lb, row_lb)
+        self.row_ub = np.append(self.row_ub, row_ub)
+        self.family_rows.update({family: offset + np.array(indices) for family, indices in rows.families.items()})
+
+        self.stats = self.model_stats(zb=block, bb_points=block, tc_points=block, chips=chip.size)
+
+    @property
+    def player_families(self) -> tuple[str, ...]:
+        return self.FAMILIES + ('zb', 'bb_points', 'tc_points')
+
+    def set_scores(self, players, scores: np.ndarray) -> None:
+        """Also scores the chip points once their columns exist"""
+        super().set_scores(players, scores)
+        if 'bb_points' in self.var:
+            self.c[self.var['bb_points'][players]] = -0.9 * scores
+            self.c[self.var['tc_points'][players]] = -scores
+
+    def read_solution(self, values: np.ndarray) -> dict:
+        """Also reads the chip calendar into self.chips, mapping each gameweek with a chip to its name"""
+        self.chips = {
+            self.gameweeks[j]: name for name, columns in self.chip_var.items() for j in np.flatnonzero(values[columns])
+        }
+        return super().read_solution(values)
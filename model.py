@@ -1,20 +1,63 @@
+import os
 import sys
-from pulp import LpVariable, LpProblem, LpStatus, LpMaximize, LpBinary, LpInteger, lpSum, value as lpValue
+import tempfile
+import numpy as np
 from premierleague import PremierLeague
 from premierleague.role import Role
 from fantasyteam import FantasyTeam
+from scoring import ScoringParameters, ScoreMatrix, expected_points
+from stochastic import RiskConfig, stochastic_points
+from pruning import prune_dominated
+from plan import FAMILIES, Plan
+from solver import SolverConfig, OPTIMAL, STATUS
+from telemetry import SolveReport, PhaseRecorder, constraint_family, parse_cbc_log
+
+# Number of players of role r required to make up a squad of 15
+SQUAD_ROLES = {Role.GK: 2, Role.DF: 5, Role.MF: 5, Role.FW: 3}
+
+# Lower and upper bounds on the number of players of role r that must be in the starting 11
+STARTING_MIN = {Role.GK: 1, Role.DF: 3, Role.MF: 3, Role.FW: 1}
+STARTING_MAX = {Role.GK: 1, Role.DF: 5, Role.MF: 5, Role.FW: 3}
 
 
 class FantasyModel:
 
-    def __init__(self, pl: PremierLeague, team: FantasyTeam) -> None:
+    def __init__(self, pl: PremierLeague, team: FantasyTeam, params: ScoringParameters | None = None) -> None:
         self.pl = pl
         self.team = team
-        self.model = LpProblem(name='fantasypl', sense=LpMaximize)
-
-    def solve(self, horizon_len: int, history_len: int, max_gw: int = 38) -> None:
+        self.params = params or ScoringParameters()
+        self.model = None
+
+    def solve(self, horizon_len: int, history_len: int, max_gw: int = 38, prune: bool = False,
+              config: SolverConfig | None = None, warm_start: dict | None = None, track_memory: bool = False,
+              profile: bool = False, risk: RiskConfig | None = None, compact: bool = False,
+              scores: ScoreMatrix | None = None, chips: tuple[str, ...] | None = None,
+              players: list | None = None) -> None:
+        """
+        Builds and solves the model over the horizon. The solution is kept as self.plan and stored in the
+        fantasy team.
+        config chooses the backend and solver and limits the solve time and gap, see SolverConfig. When a limit
+        stops the solver early the best solution found is used and self.gap holds its relative gap.
+        warm_start is a plan from plan.shift_plan that is passed to CBC as a MIP start.
+        Telemetry for every phase is kept in self.report. track_memory adds peak memory per phase and
+        profile runs cProfile over the model build. risk replaces the deterministic expected points with
+        sampled, risk-adjusted ones, see stochastic.RiskConfig. compact solves the equivalent compact
+        formulation (matrixmodel.CompactMatrixModel), which is only available on the 'highs' backend.
+        scores are precomputed expected points for every player over the horizon, shared between teams.
+        chips lists the chips still available (see fantasyteam.CHIPS) and chooses when to play them in the same
+        solve (matrixmodel.ChipMatrixModel, 'highs' backend only). The calendar is kept in self.chips.
+        players restricts who may be selected; the current squad and this gameweek's transfers are always modelled.
+        """
         self.horizon_len = horizon_len
         self.history_len = history_len
+        config = config or SolverConfig()
+        if compact and config.backend != 'highs':
+            raise ValueError("The compact formulation is only available on the 'highs' backend")
+        if chips is not None and (config.backend != 'highs' or compact):
+            raise ValueError("Chips are only planned by the full formulation on the 'highs' backend")
+        self.chips = {}
+        self.report = SolveReport()
+        self.recorder = PhaseRecorder(self.report, track_memory)
 
         if self.pl.current_gw + self.horizon_len > max_gw:
             sys.exit(f"Horizon length of {self.horizon_len} exceed maximum gameweek of {max_gw}")
@@ -22,8 +65,16 @@ class FantasyModel:
         # ----------------------------------------
         # Sets & Subsets
         # ---------------------------------------
+        # Players the current gameweek already involves, which must stay in the model
+        current = set(self.team.players[self.pl.current_gw])
+        current.update(p.id for p in self.team.transfers_in.get(self.pl.current_gw, []))
+        current.update(p.id for p in self.team.transfers_out.get(self.pl.current_gw, []))
+
         # Set of players
-        P = self.pl.get_players().values()
+        P = list(self.pl.get_players().values())
+        if players is not None:
+            allowed = current | {p.id for p in players}
+            P = [p for p in P if p.id in allowed]
 
         # Set of clubs
         C = self.pl.clubs.values()
@@ -34,28 +85,61 @@ class FantasyModel:
         # Set of roles (player positions)
         R = list(Role)
 
-        P_r = {
-            Role.GK: self.pl.get_players_by_role(Role.GK).values(),
-            Role.DF: self.pl.get_players_by_role(Role.DF).values(),
-            Role.MF: self.pl.get_players_by_role(Role.MF).values(),
-            Role.FW: self.pl.get_players_by_role(Role.FW).values()
-        }
-
         # ----------------------------------------
         # Parameters
         # ---------------------------------------
         # Number of players of role r required to make up a squad of 15
-        n_r = {Role.GK: 2, Role.DF: 5, Role.MF: 5, Role.FW: 3}
+        n_r = SQUAD_ROLES
 
         # Lower bound on the number of players of role r that must be in the starting 11
-        l_r = {Role.GK: 1, Role.DF: 3, Role.MF: 3, Role.FW: 1}
+        l_r = STARTING_MIN
 
         # Upper bound on the number of players of role r that must be in the starting 11
-        u_r = {Role.GK: 1, Role.DF: 5, Role.MF: 5, Role.FW: 3}
+        u_r = STARTING_MAX
 
         # Balance remaining
         b_r = self.team.bank
 
+        # Expected points of player p during gameweek g
+        if scores is not None:
+            self.scores = scores
+        elif risk is None:
+            self.scores = expected_points(self.pl, G, self.history_len, self.params, players=P)
+        else:
+            self.scores = stochastic_points(self.pl, G, self.history_len, risk, self.params, players=P)
+        s = self.scores.as_dict()
+
+        # Remove players that can never improve on a cheaper alternative
+        self.pruned_players = []
+        if prune:
+            P, self.pruned_players = prune_dominated(P, self.scores, current, n_r)
+
+        # Subset of players with role r
+        P_r = {r: [p for p in P if p.role == r] for r in R}
+
+        for p in self.team.players[self.pl.current_gw].values():
+            self.team.expected_points.setdefault(self.pl.current_gw, {})[p.id] = s[(p.id, self.pl.current_gw)]
+
+        # Expected points of the modelled players, as a (players, gameweeks) array in the order of P
+        expected = self.scores.values[[self.scores.index[p.id] for p in P]]
+        self.plan = None
+
+        self.recorder.mark('scoring')
+        if profile:
+            self.recorder.start_profile()
+
+        if config.backend == 'highs':
+            self.solve_matrix(P, C, G, expected, n_r, l_r, u_r, config, compact, chips)
+            self.recorder.close()
+            return
+
+        # PuLP is only imported for its own backend, so nothing else pays for loading it
+        from pulp import (
+            LpVariable, LpProblem, LpSolution, LpMaximize, LpBinary, LpInteger, LpSolutionOptimal,
+            LpSolutionIntegerFeasible, lpSum, value as lpValue
+        )
+        self.model = LpProblem(name='fantasypl', sense=LpMaximize)
+
         # ----------------------------------------
         # Decision Variables
         # ---------------------------------------
@@ -99,26 +183,26 @@ class FantasyModel:
                 b[g].setInitialValue(b_r)
                 b[g].fixValue()
 
-                # Set initial squad
-                for p in self.team.players[g].values():
-                    z[(p.id, g)].setInitialValue(1)
-                    z[(p.id, g)].fixValue()
-
-                # Set current Captain
-                cc[(self.team.captain[g].id, g)].setInitialValue(1)
-                cc[(self.team.captain[g].id, g)].fixValue
-
-                # Set current vice Captain
-                vc[(self.team.vice_captain[g].id, g)].setInitialValue(1)
-                vc[(self.team.vice_captain[g].id, g)].fixValue
-
-                for p in self.team.transfers_in.get(g, []):
-                    t_in[(p.id, g)].setInitialValue(1)
-                    t_in[(p.id, g)].fixValue()
-
-                for p in self.team.transfers_out.get(g, []):
-                    t_out[(p.id, g)].setInitialValue(1)
-                    t_out[(p.id, g)].fixValue()
+                # Pin every player's current squad, line-up, captaincy and transfer status. Leaving the other
+                # players free would let the solver pretend they were already in the squad.
+                squad = self.team.players[g]
+                starting = set(self.team.starting.get(g, []))
+                bench = set(self.team.bench.get(g, []))
+                transferred_in = {p.id for p in self.team.transfers_in.get(g, [])}
+                transferred_out = {p.id for p in self.team.transfers_out.get(g, [])}
+
+                for p in P:
+                    for var, selected in (
+                        (z, p.id in squad),
+                        (x, p.id in starting),
+                        (y, p.id in bench),
+                        (cc, p == self.team.captain[g]),
+                        (vc, p == self.team.vice_captain[g]),
+                        (t_in, p.id in transferred_in),
+                        (t_out, p.id in transferred_out)
+                    ):
+                        var[(p.id, g)].setInitialValue(int(selected))
+                        var[(p.id, g)].fixValue()
 
                 continue
 
@@ -183,68 +267,178 @@ class FantasyModel:
                 self.model += lpSum([x[(p.id, g)]] for p in P_r[r]) <= u_r[r], name
 
             for c in C:
-                name = f"GW {g}: Max 3 players from club {c}"
+                name = f"GW {g}: Max 3 players from club {c.id}"
                 self.model += lpSum([z[(p.id, g)]] for p in P if p.club_id == c.id) <= 3, name
 
         # ----------------------------------------
         # Objective Function
         # --------------------------------------
 
-        points = lpSum([x[(p.id, g)] * self.calculate_score(p, g) for p in P for g in G])
-        bench = 0.1 * lpSum([y[(p.id, g)] * self.calculate_score(p, g) for p in P for g in G])
-        captain = lpSum([cc[(p.id, g)] * self.calculate_score(p, g) for p in P for g in G])
+        points = lpSum([x[(p.id, g)] * s[(p.id, g)] for p in P for g in G])
+        bench = 0.1 * lpSum([y[(p.id, g)] * s[(p.id, g)] for p in P for g in G])
+        captain = lpSum([cc[(p.id, g)] * s[(p.id, g)] for p in P for g in G])
 
         self.model += points + bench + captain
 
-        self.model.solve()
-        self.status = LpStatus[self.model.status]
-        self.objective_value = lpValue(self.model.objective)
+        if warm_start:
+            self.set_warm_start(warm_start, P, G, {
+                'x': x, 'y': y, 'z': z, 't_in': t_in, 't_out': t_out, 'cc': cc, 'vc': vc, 'zero_t': zero_t
+            })
+
+        self.recorder.mark('build')
+        self.report.model = self.model_stats({
+            'x': x, 'y': y, 'z': z, 't_in': t_in, 't_out': t_out, 'zero_t': zero_t, 'cc': cc, 'vc': vc, 'b': b
+        })
+        self.record_pruning(len(FAMILIES))
+
+        # Unless it is streamed, the solver's log goes to a file so CBC's statistics can be parsed afterwards
+        log = ''
+        if config.msg:
+            self.model.solve(config.pulp_solver(bool(warm_start)))
+        else:
+            fd, log_path = tempfile.mkstemp(suffix='.log')
+            os.close(fd)
+            try:
+                self.model.solve(config.pulp_solver(bool(warm_start), log_path))
+                with open(log_path) as file:
+                    log = file.read()
+            finally:
+                os.remove(log_path)
+
+        # PuLP reports a solution found before a limit stopped the search as integer feasible, for every solver
+        self.report.solver = parse_cbc_log(log)
+        self.solution_status = LpSolution[self.model.sol_status]
+        self.status = STATUS.get(self.solution_status, 'Not Solved')
+        self.gap = self.report.solver['gap']
+        if self.gap is None and self.solution_status == OPTIMAL and config.gap is None:
+            self.gap = 0.0
+        solved = self.model.sol_status in (LpSolutionOptimal, LpSolutionIntegerFeasible)
+        self.objective_value = lpValue(self.model.objective) if solved else None
+        self.recorder.mark('solve')
 
         # ----------------------------------------
         # Store results in fantasy team instance
         # --------------------------------------
 
-        for g in range(self.pl.current_gw + 1, self.pl.current_gw + self.horizon_len + 1):
-
-            for p in self.pl.get_players().values():
-                if lpValue(cc[(p.id, g)]):
-                    self.team.captain[g] = p
-
-                if lpValue(vc[(p.id, g)]):
-                    self.team.vice_captain[g] = P
+        if solved:
+            # Read every family's values in one pass. LpVariable.dicts keeps its (player, gameweek) creation
+            # order, so the values are iterated directly instead of looked up key by key.
+            variables = {'x': x, 'y': y, 'z': z, 't_in': t_in, 't_out': t_out, 'cc': cc, 'vc': vc}
+            values = np.fromiter(
+                (v.varValue or 0 for f in FAMILIES for v in variables[f].values()), float,
+                len(FAMILIES) * len(P) * len(G)
+            ).reshape(len(FAMILIES), len(P), len(G)) > 0.5
+            solution = dict(zip(FAMILIES, values))
+            self.plan = Plan.from_solution(P, G, solution, expected)
+            self.plan.apply(self.team, self.pl)
+
+        self.recorder.mark('extract')
+        self.recorder.close()
+
+    @property
+    def timings(self) -> dict:
+        """Wall-clock seconds spent in each phase of the last solve"""
+        return {phase: stats.seconds for phase, stats in self.report.phases.items()}
+
+    def record_pruning(self, families: int) -> None:
+        """Adds the pruned players and the variables they would have needed, given the families per player"""
+        self.pruned_variables = len(self.pruned_players) * (self.horizon_len + 1) * families
+        self.report.model['pruned'] = {'players': len(self.pruned_players), 'variables': self.pruned_variables}
+
+    def model_stats(self, variables: dict) -> dict:
+        """Variable and constraint counts by family and the number of nonzero coefficients in the PuLP model"""
+        constraints = {}
+        for name in self.model.constraints:
+            family = constraint_family(name)
+            constraints[family] = constraints.get(family, 0) + 1
+
+        return {
+            'variables': {f: len(v) for f, v in variables.items()},
+            'constraints': constraints,
+            'nonzeros': sum(len(c) for c in self.model.constraints.values())
+        }
 
-                if lpValue(t_in[(p.id, g)]):
-                    self.team.transfers_in.setdefault(g, []).append(p)
+    def set_warm_start(self, plan: dict, P: list, G: range, variables: dict) -> None:
+        """
+        Sets initial values for every future gameweek the plan covers. Transfers are recomputed from the
+        planned squads so the start stays consistent with the squad we actually hold this gameweek.
+        """
+        previous = set(self.team.players[G.start])
+        transferred = bool(self.team.transfers_in.get(G.start))
 
-                if lpValue(t_out[(p.id, g)]):
-                    self.team.transfers_out.setdefault(g, []).append(p)
+        for g in G[1:]:
+            if g not in plan:
+                break
 
-                if lpValue(x[(p.id, g)]):
-                    self.team.starting.setdefault(g, []).append(p.id)
-                    self.team.players.setdefault(g, {})[p.id] = p
+            squad = set(plan[g]['squad'])
+            starting = set(plan[g]['starting'])
+            bench = set(plan[g]['bench'])
+            variables['zero_t'][g].setInitialValue(int(not transferred))
 
-                if lpValue(y[(p.id, g)]):
-                    self.team.bench.setdefault(g, []).append(p.id)
-                    self.team.players.setdefault(g, {})[p.id] = p
+            for p in P:
+                for f, selected in (
+                    ('z', p.id in squad),
+                    ('x', p.id in starting),
+                    ('y', p.id in bench),
+                    ('cc', p.id == plan[g]['captain']),
+                    ('vc', p.id == plan[g]['vice_captain']),
+                    ('t_in', p.id in squad and p.id not in previous),
+                    ('t_out', p.id in previous and p.id not in squad)
+                ):
+                    variables[f][(p.id, g)].setInitialValue(int(selected))
+
+            transferred = squad != previous
+            previous = squad
+
+    def solve_matrix(self, P: list, C, G: range, expected: np.ndarray, n_r: dict, l_r: dict, u_r: dict,
+                     config: SolverConfig, compact: bool = False, chips: tuple[str, ...] | None = None) -> None:
+        """Solves the same formulation, or the compact one, as sparse arrays with HiGHS, skipping PuLP entirely"""
+        # SciPy is only imported for this backend, like PuLP for its own
+        from matrixmodel import MatrixModel, CompactMatrixModel, ChipMatrixModel
+
+        if chips is not None:
+            matrix = ChipMatrixModel(P, list(C), G, self.team, expected, n_r, l_r, u_r, chips)
+        elif compact:
+            matrix = CompactMatrixModel(P, list(C), G, self.team, expected, n_r, l_r, u_r)
+        else:
+            matrix = MatrixModel(P, list(C), G, self.team, expected, n_r, l_r, u_r)
+        self.recorder.mark('build')
+        self.report.model = matrix.stats
+        self.record_pruning(len(matrix.player_families))
+
+        matrix.solve(config.highs_options())
+        self.status = matrix.status
+        self.solution_status = matrix.solution_status
+        self.objective_value = matrix.objective_value
+        self.report.solver = matrix.solver_stats
+        self.gap = matrix.solver_stats['gap']
+        self.recorder.mark('solve')
+
+        if matrix.solution is not None:
+            self.chips = getattr(matrix, 'chips', {})
+            self.plan = Plan.from_solution(P, G, matrix.solution, expected, self.chips)
+            self.plan.apply(self.team, self.pl)
+        self.recorder.mark('extract')
 
     def calculate_score(self, player, gw) -> float:
         """
-        Used to calculate how many points we expect a player to earn during each gameweek
+        Used to calculate how many points we expect a player to earn during each gameweek.
+        Reference implementation for a single player; solve() uses scoring.expected_points instead.
         """
         club = self.pl.get_club(player.club_id)
         points = 0
         games = 0
 
-        fixture_multiplier = 0.05
-        home_adv = 0.1
-        difficulty_multiplier = 0.15
+        fixture_multiplier = self.params.fixture_multiplier
+        home_adv = self.params.home_adv
+        difficulty_multiplier = self.params.difficulty_multiplier
 
         for g in range(self.pl.current_gw - self.history_len, self.pl.current_gw + 1):
             for gw_points in player.points.get(g, []):
                 points += gw_points * (1 - (fixture_multiplier * (self.pl.current_gw - g)))
                 games += 1
 
-        points = points / games
+        points = points / games if games else 0
         this_gw = 0
         for f in club.fixtures.get(gw, []):
             at_home = f.home_team == club.id
@@ -252,9 +446,4 @@ class FantasyModel:
             this_gw += 1 - (difficulty_multiplier * difficulty)
             this_gw += home_adv if at_home else 0
 
-        score = round(player.chance_of_playing * points * this_gw, 2)
-        if len(player.points.get(gw, [])) == 0:
-            # This is the first time we've calculated for this player => Store in the player's instance
-            player.add_gameweek_stat(gw, 'points', score)
-
-        return score
+        return round(player.chance_of_playing * points * this_gw, 2)
@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+import numpy as np
+import utils
+from fantasyteam import FantasyTeam
+from premierleague import PremierLeague, Role
+
+# Per player and gameweek variable families of a solution, in the order they are laid out in the solution vector
+FAMILIES = ('x', 'y', 'z', 't_in', 't_out', 'cc', 'vc')
+
+
+@dataclass(frozen=True, slots=True)
+class GameweekPlan:
+    """
+    One gameweek of a solved plan as player ids. The starting 11 is ordered by role and the bench in
+    substitution order, goalkeeper first. expected_points follows the order of squad. chip names the chip
+    played in the gameweek, if any.
+    """
+    starting: tuple[int, ...]
+    bench: tuple[int, ...]
+    captain: int
+    vice_captain: int
+    transfers_in: tuple[int, ...]
+    transfers_out: tuple[int, ...]
+    expected_points: tuple[float, ...]
+    chip: str | None = None
+
+    @property
+    def squad(self) -> tuple[int, ...]:
+        return self.starting + self.bench
+
+
+@dataclass(frozen=True, slots=True)
+class Plan:
+    """The solved selections for each gameweek after the current one"""
+    gameweeks: range
+    weeks: tuple[GameweekPlan, ...]
+
+    def __getitem__(self, gw: int) -> GameweekPlan:
+        return self.weeks[self.gameweeks.index(gw)]
+
+    def __contains__(self, gw: int) -> bool:
+        return gw in self.gameweeks
+
+    def items(self):
+        return zip(self.gameweeks, self.weeks)
+
+    @classmethod
+    def from_solution(cls, players: list, gameweeks: range, solution: dict, expected: np.ndarray,
+                      chips: dict | None = None) -> 'Plan':
+        """
+        Builds the plan from boolean (players, gameweeks) arrays of each variable family, as laid out in
+        FAMILIES, reading only the selected entries. The first gameweek is the current one and
+        is not part of the plan. chips maps gameweeks to the chip played in them.
+        """
+        chips = chips or {}
+        selected = {f: np.nonzero(values[:, 1:].T) for f, values in solution.items()}
+        weeks = [{f: [] for f in solution} for _ in gameweeks[1:]]
+        for f, (js, ids) in selected.items():
+            for j, i in zip(js.tolist(), ids.tolist()):
+                weeks[j][f].append(i)
+
+        plans = []
+        for j, (g, week) in enumerate(zip(gameweeks[1:], weeks), start=1):
+            starting = sorted(week['x'], key=lambda i: (players[i].role.value, -expected[i, j]))
+            bench = sorted(week['y'], key=lambda i: (players[i].role != Role.GK, -expected[i, j]))
+            plans.append(GameweekPlan(
+                starting=tuple(players[i].id for i in starting),
+                bench=tuple(players[i].id for i in bench),
+                captain=players[week['cc'][0]].id,
+                vice_captain=players[week['vc'][0]].id,
+                transfers_in=tuple(players[i].id for i in week['t_in']),
+                transfers_out=tuple(players[i].id for i in week['t_out']),
+                expected_points=tuple(float(expected[i, j]) for i in starting + bench),
+                chip=chips.get(g)
+            ))
+        return cls(gameweeks[1:], tuple(plans))
+
+    def apply(self, team: FantasyTeam, pl: PremierLeague) -> None:
+        """Populates the fantasy team with every planned gameweek"""
+        for g, week in self.items():
+            squad = {id: pl.get_player_by_id(id) for id in week.squad}
+            team.players[g] = squad
+            team.starting[g] = list(week.starting)
+            team.bench[g] = list(week.bench)
+            team.captain[g] = squad[week.captain]
+            team.vice_captain[g] = squad[week.vice_captain]
+            team.expected_points[g] = dict(zip(week.squad, week.expected_points))
+            if week.chip:
+                team.chips[g] = week.chip
+            if week.transfers_in:
+                team.transfers_in[g] = [pl.get_player_by_id(id) for id in week.transfers_in]
+                team.transfers_out[g] = [pl.get_player_by_id(id) for id in week.transfers_out]
+
+
+def plan_from_team(team: FantasyTeam, gameweeks: range) -> dict:
+    """Squad, starting 11, bench, captaincy and transfers of each gameweek as player ids"""
+    plan = {}
+    for g in gameweeks:
+        if g not in team.players:
+            continue
+
+        plan[g] = {
+            'squad': sorted(team.players[g]),
+            'starting': sorted(team.starting.get(g, [])),
+            'bench': sorted(team.bench.get(g, [])),
+            'captain': team.captain[g].id if g in team.captain else None,
+            'vice_captain': team.vice_captain[g].id if g in team.vice_captain else None,
+            'transfers_in': sorted(p.id for p in team.transfers_in.get(g, [])),
+            'transfers_out': sorted(p.id for p in team.transfers_out.get(g, [])),
+            'chip': team.chips.get(g),
+            'expected_points': team.expected_points.get(g, {})
+        }
+    return plan
+
+
+def team_from_plan(plan: dict, pl: PremierLeague) -> FantasyTeam:
+    """A fantasy team holding every gameweek of a plan read by load_plan, for display"""
+    team = FantasyTeam()
+    players = pl.get_players()
+    for g, week in plan.items():
+        team.players[g] = {id: players[id] for id in week['squad']}
+        team.starting[g] = list(week['starting'])
+        team.bench[g] = list(week['bench'])
+        team.captain[g] = players[week['captain']]
+        team.vice_captain[g] = players[week['vice_captain']]
+        team.transfers_in[g] = [players[id] for id in week['transfers_in']]
+        team.transfers_out[g] = [players[id] for id in week['transfers_out']]
+        team.expected_points[g] = week.get('expected_points', {})
+        if week.get('chip'):
+            team.chips[g] = week['chip']
+    return team
+
+
+def save_plan(filepath: str, team: FantasyTeam, gameweeks: range) -> None:
+    utils.write_to_json_file(filepath, plan_from_team(team, gameweeks))
+
+
+def load_plan(filepath: str) -> dict:
+    return utils.read_from_json_file(filepath)
+
+
+def shift_plan(plan: dict, gameweeks: range) -> dict:
+    """
+    Re-aligns a previous run's plan to a new horizon. Gameweeks the plan already covers are kept and any
+    new gameweeks at the end of the horizon hold the last planned squad with no transfers.
+    """
+    shifted = {}
+    last = None
+    for g in gameweeks:
+        if g in plan:
+            last = plan[g]
+            shifted[g] = plan[g]
+        elif last is not None:
+            shifted[g] = {**last, 'transfers_in': [], 'transfers_out': []}
+    return shifted
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from .player import Player
 from .role import Role
 
@@ -20,8 +20,12 @@ class Club:
     short_name: str
     players: dict
     fixtures: dict
+    # PremierLeague whose indexes are kept up to date, set by PremierLeague.add_club
+    league: object = field(default=None, repr=False, compare=False)
 
     def get_players_by_role(self, role: Role) -> dict:
+        if self.league is not None:
+            return self.league.get_club_players_by_role(self.id, role)
         return {id: p for id, p in self.players.items() if p.role == role}
 
     def get_goalkeepers(self) -> dict:
@@ -38,6 +42,8 @@ class Club:
 
     def add_player(self, player: Player) -> None:
         self.players[player.id] = player
+        if self.league is not None:
+            self.league.index_player(player)
 
     def add_fixture(self, fixture: Fixture) -> None:
         self.fixtures.setdefault(fixture.gameweek, []).append(fixture)
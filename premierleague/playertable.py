@@ -0,0 +1,146 @@
+import numpy as np
+from .role import Role
+
+
+class PlayerTable:
+    """
+    Struct-of-arrays store of players: one contiguous NumPy array per attribute and dense (players x gameweeks)
+    matrices of points, minutes and games played. Double gameweeks are summed into a single column, with games
+    recording how many fixtures contributed. Rows are exposed to display code as lightweight PlayerView objects.
+    """
+
+    def __init__(self, ids: np.ndarray, club_ids: np.ndarray, roles: np.ndarray, costs: np.ndarray,
+                 chance_of_playing: np.ndarray, first_names: list, surnames: list, gameweeks: range) -> None:
+        n = len(ids)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.club_ids = np.asarray(club_ids, dtype=np.int16)
+        self.roles = np.asarray(roles, dtype=np.int8)
+        self.costs = np.asarray(costs, dtype=np.int16)
+        self.chance_of_playing = np.asarray(chance_of_playing, dtype=np.float32)
+        self.first_names = list(first_names)
+        self.surnames = list(surnames)
+
+        self.gameweeks = gameweeks
+        self.points = np.zeros((n, len(gameweeks)), dtype=np.float32)
+        self.minutes = np.zeros((n, len(gameweeks)), dtype=np.int16)
+        self.games = np.zeros((n, len(gameweeks)), dtype=np.int8)
+
+        self.index = {id: i for i, id in enumerate(self.ids.tolist())}
+
+    @classmethod
+    def from_league(cls, pl, gameweeks: range = range(1, 39)) -> 'PlayerTable':
+        """Copies every player of a PremierLeague into a table"""
+        players = list(pl.get_players().values())
+        table = cls(
+            [p.id for p in players], [p.club_id for p in players], [p.role.value for p in players],
+            [p.cost for p in players], [p.chance_of_playing for p in players],
+            [p.first_name for p in players], [p.surname for p in players], gameweeks
+        )
+
+        for i, p in enumerate(players):
+            for g, values in p.points.items():
+                if g in gameweeks:
+                    table.points[i, g - gameweeks.start] = sum(values)
+                    table.games[i, g - gameweeks.start] = len(values)
+            for g, values in p.minutes.items():
+                if g in gameweeks:
+                    table.minutes[i, g - gameweeks.start] = sum(values)
+
+        return table
+
+    def add_history(self, rows: np.ndarray, rounds: np.ndarray, points: np.ndarray, minutes: np.ndarray) -> None:
+        """Accumulates history rows (one per fixture played) into the gameweek matrices in a single pass"""
+        keep = (rounds >= self.gameweeks.start) & (rounds < self.gameweeks.stop)
+        at = (rows[keep], rounds[keep] - self.gameweeks.start)
+        np.add.at(self.points, at, points[keep])
+        np.add.at(self.minutes, at, minutes[keep])
+        np.add.at(self.games, at, 1)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, id: int) -> 'PlayerView':
+        return PlayerView(self, self.index[id])
+
+    def __iter__(self):
+        return (PlayerView(self, i) for i in range(len(self)))
+
+    def rows_by_role(self, role: Role) -> np.ndarray:
+        return np.flatnonzero(self.roles == role.value)
+
+    def rows_by_club(self, club_id: int) -> np.ndarray:
+        return np.flatnonzero(self.club_ids == club_id)
+
+    def nbytes(self) -> int:
+        """Bytes held by the numeric arrays"""
+        arrays = (self.ids, self.club_ids, self.roles, self.costs, self.chance_of_playing,
+                  self.points, self.minutes, self.games)
+        return sum(a.nbytes for a in arrays)
+
+
+class PlayerView:
+    """Read-only view of one PlayerTable row exposing the Player attributes used for display"""
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: PlayerTable, row: int) -> None:
+        self.table = table
+        self.row = row
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PlayerView) and other.table is self.table and other.row == self.row
+
+    def __hash__(self) -> int:
+        return hash((id(self.table), self.row))
+
+    def __repr__(self) -> str:
+        return f"PlayerView(id={self.id}, name={self.name!r})"
+
+    @property
+    def id(self) -> int:
+        return int(self.table.ids[self.row])
+
+    @property
+    def first_name(self) -> str:
+        return self.table.first_names[self.row]
+
+    @property
+    def surname(self) -> str:
+        return self.table.surnames[self.row]
+
+    @property
+    def name(self) -> str:
+        return f"{self.first_name} {self.surname}"
+
+    @property
+    def club_id(self) -> int:
+        return int(self.table.club_ids[self.row])
+
+    @property
+    def role(self) -> Role:
+        return Role(int(self.table.roles[self.row]))
+
+    @property
+    def cost(self) -> int:
+        return int(self.table.costs[self.row])
+
+    @property
+    def chance_of_playing(self) -> float:
+        return float(self.table.chance_of_playing[self.row])
+
+    @property
+    def points(self) -> dict:
+        """
+        Points per played gameweek in the same {gw: [points]} shape as Player.points, except that a double
+        gameweek is a single entry holding the sum of its fixtures, since the table keeps no per-fixture points.
+        The number of fixtures is in PlayerTable.games.
+        """
+        start = self.table.gameweeks.start
+        played = np.flatnonzero(self.table.games[self.row])
+        return {int(j) + start: [float(self.table.points[self.row, j])] for j in played}
+
+    @property
+    def minutes(self) -> dict:
+        """Minutes per played gameweek, a double gameweek summed into a single entry like points"""
+        start = self.table.gameweeks.start
+        played = np.flatnonzero(self.table.games[self.row])
+        return {int(j) + start: [int(self.table.minutes[self.row, j])] for j in played}
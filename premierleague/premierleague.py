@@ -4,28 +4,46 @@ from .role import Role
 
 
 class PremierLeague:
+    """
+    Players are indexed by id, by role and by club and role as they are added to clubs, so lookups never
+    rebuild a dict. The returned dicts are the indexes themselves and must not be modified by callers.
+    """
 
     def __init__(self) -> None:
         self.clubs = {}
         self.current_gw = 1
+        self.players = {}
+        self.players_by_role = {r: {} for r in Role}
+        self.players_by_club_role = {}
 
     def add_club(self, club: Club) -> None:
         self.clubs[club.id] = club
+        club.league = self
+        for player in club.players.values():
+            self.index_player(player)
+
+    def index_player(self, player: Player) -> None:
+        """Called by Club.add_player whenever a player joins one of the league's clubs"""
+        previous = self.players.get(player.id)
+        if previous is not None:
+            del self.players_by_role[previous.role][previous.id]
+            del self.players_by_club_role[(previous.club_id, previous.role)][previous.id]
+
+        self.players[player.id] = player
+        self.players_by_role[player.role][player.id] = player
+        self.players_by_club_role.setdefault((player.club_id, player.role), {})[player.id] = player
 
     def get_club(self, club_id) -> Club:
         return self.clubs[club_id]
 
     def get_players(self) -> dict:
-        players = {}
-        for club in self.clubs.values():
-            players = players | club.players
-        return players
+        return self.players
 
     def get_players_by_role(self, role: Role) -> dict:
-        players = {}
-        for club in self.clubs.values():
-            players = players | club.get_players_by_role(role)
-        return players
+        return self.players_by_role[role]
+
+    def get_club_players_by_role(self, club_id: int, role: Role) -> dict:
+        return self.players_by_club_role.get((club_id, role), {})
 
     def get_player_by_id(self, id: int) -> Player:
-        return self.get_players()[id]
+        return self.players[id]
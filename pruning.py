@@ -0,0 +1,63 @@
+import numpy as np
+from scoring import ScoreMatrix
+
+# Squad rules that limit how many dominating players could already be unavailable
+SQUAD_SIZE = 15
+MAX_PLAYERS_PER_CLUB = 3
+
+
+def dominance_matrix(costs: np.ndarray, scores: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    dominates[i, j] is True when player i costs no more than player j and scores at least as much in every
+    gameweek. Identical players are ordered by id so that two players never dominate each other.
+    """
+    cheaper = costs[:, None] <= costs[None, :]
+    at_least = (scores[:, None, :] >= scores[None, :, :]).all(axis=2)
+    strictly = (
+        (costs[:, None] < costs[None, :])
+        | (scores[:, None, :] > scores[None, :, :]).any(axis=2)
+        | (ids[:, None] < ids[None, :])
+    )
+    dominates = cheaper & at_least & strictly
+    np.fill_diagonal(dominates, False)
+    return dominates
+
+
+def prune_dominated(players: list, scores: ScoreMatrix, keep: set, n_r: dict) -> tuple[list, list]:
+    """
+    Splits players into those worth modelling and those that are dominated.
+
+    A player of role r is removed when the players dominating it span at least n_r[r] + 4 clubs. Within a single
+    gameweek, whatever the rest of the squad looks like, at most n_r[r] - 1 of those clubs hold a dominating
+    team mate already in the squad and at most 4 others are full, so a dominating player can always be swapped
+    in without losing points, breaking the budget or the club limit. Over several gameweeks the squad, and so
+    the blocked clubs, change from week to week while a swap has to hold for as long as the player is kept, so
+    the plan found without the removed players may be worse than the optimum. Pruning is therefore a heuristic
+    that callers opt into. Players in `keep` (the current squad) are never removed.
+    """
+    blocked_clubs = (SQUAD_SIZE - 1) // MAX_PLAYERS_PER_CLUB
+    kept, removed = [], []
+
+    for r in n_r:
+        group = [p for p in players if p.role == r]
+        if not group:
+            continue
+
+        ids = np.array([p.id for p in group])
+        costs = np.array([p.cost for p in group])
+        clubs = np.array([p.club_id for p in group])
+        values = scores.values[[scores.index[p.id] for p in group]]
+        dominates = dominance_matrix(costs, values, ids)
+
+        # Dominating players always come first in this order, so their own fate is already decided
+        order = np.lexsort((ids, -values.sum(axis=1), costs))
+        is_kept = np.zeros(len(group), dtype=bool)
+        for j in order:
+            dominators = dominates[:, j] & is_kept
+            if group[j].id in keep or len(np.unique(clubs[dominators])) < n_r[r] + blocked_clubs:
+                is_kept[j] = True
+
+        kept.extend(p for p, k in zip(group, is_kept) if k)
+        removed.extend(p for p, k in zip(group, is_kept) if not k)
+
+    return kept, removed
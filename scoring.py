@@ -0,0 +1,120 @@
+import os
+from dataclasses import dataclass, fields
+import numpy as np
+import utils
+from premierleague import PremierLeague
+from premierleague.playertable import PlayerView
+
+# Parameters fitted by calibrate.py, the defaults are used until it has been run
+PARAMS_FILE = 'data/params.json'
+
+# Gameweeks of history used for expected points when none is given and nothing has been calibrated
+DEFAULT_HISTORY_LEN = 10
+
+
+@dataclass
+class ScoringParameters:
+    fixture_multiplier: float = 0.05
+    home_adv: float = 0.1
+    difficulty_multiplier: float = 0.15
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ScoringParameters':
+        """Takes the parameters from data, ignoring anything else stored alongside them"""
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+
+def load_calibration(filepath: str = PARAMS_FILE) -> tuple[ScoringParameters | None, int]:
+    """
+    The parameters and history length fitted by calibrate.py, or no parameters (so the defaults are used) and
+    DEFAULT_HISTORY_LEN while the file doesn't exist
+    """
+    if not os.path.exists(filepath):
+        return None, DEFAULT_HISTORY_LEN
+    data = utils.read_from_json_file(filepath)
+    return ScoringParameters.from_dict(data), int(data.get('history_len', DEFAULT_HISTORY_LEN))
+
+
+@dataclass
+class ScoreMatrix:
+    """
+    Expected points for every player (rows) in every gameweek (columns)
+    """
+    player_ids: np.ndarray
+    gameweeks: range
+    values: np.ndarray
+
+    def __post_init__(self) -> None:
+        self.index = {id: i for i, id in enumerate(self.player_ids.tolist())}
+
+    def as_dict(self) -> dict:
+        """Maps (player id, gameweek) to expected points using plain Python floats"""
+        keys = ((id, g) for id in self.player_ids.tolist() for g in self.gameweeks)
+        return dict(zip(keys, self.values.ravel().tolist()))
+
+
+def history_arrays(players: list, gameweeks: range) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Builds dense (players x gameweeks) arrays of the points scored and the number of games played.
+    Double gameweeks contribute one game per fixture. PlayerTable views are rejected as they merge a double
+    gameweek into one entry; the table's own points and games arrays already hold both.
+    """
+    if any(isinstance(p, PlayerView) for p in players):
+        raise TypeError("PlayerView merges double gameweeks, use PlayerTable.points and PlayerTable.games instead")
+    points = np.zeros((len(players), len(gameweeks)))
+    games = np.zeros((len(players), len(gameweeks)))
+    first, last = gameweeks.start, gameweeks.stop
+
+    for i, player in enumerate(players):
+        for g, gw_points in player.points.items():
+            if first <= g < last and gw_points:
+                points[i, g - first] = sum(gw_points)
+                games[i, g - first] = len(gw_points)
+
+    return points, games
+
+
+def fixture_arrays(pl: PremierLeague, gameweeks: range, params: ScoringParameters) -> tuple[np.ndarray, dict]:
+    """
+    Builds a dense (clubs x gameweeks) array of fixture multipliers. Blank gameweeks are zero and
+    double gameweeks sum the multiplier of each fixture.
+    """
+    club_index = {id: i for i, id in enumerate(pl.clubs)}
+    multipliers = np.zeros((len(club_index), len(gameweeks)))
+
+    for club in pl.clubs.values():
+        for g in gameweeks:
+            for f in club.fixtures.get(g, []):
+                at_home = f.home_team == club.id
+                difficulty = f.home_team_difficulty if at_home else f.away_team_difficulty
+                multipliers[club_index[club.id], g - gameweeks.start] += (
+                    1 - params.difficulty_multiplier * difficulty + (params.home_adv if at_home else 0)
+                )
+
+    return multipliers, club_index
+
+
+def expected_points(pl: PremierLeague, gameweeks: range, history_len: int,
+                    params: ScoringParameters | None = None, players: list | None = None) -> ScoreMatrix:
+    """
+    Vectorised equivalent of FantasyModel.calculate_score for every player and gameweek at once.
+    Player instances are only read, never modified.
+    """
+    params = params or ScoringParameters()
+    players = list(pl.get_players().values()) if players is None else players
+
+    # Weighted average of the points scored across the history window
+    history = range(pl.current_gw - history_len, pl.current_gw + 1)
+    points, games = history_arrays(players, history)
+    weights = 1 - params.fixture_multiplier * (pl.current_gw - np.arange(history.start, history.stop))
+    played = games.sum(axis=1)
+    average = np.divide(points @ weights, played, out=np.zeros(len(players)), where=played > 0)
+
+    # Scale by each club's fixtures and the player's chance of playing
+    multipliers, club_index = fixture_arrays(pl, gameweeks, params)
+    clubs = np.array([club_index[p.club_id] for p in players], dtype=np.intp)
+    chance = np.array([p.chance_of_playing for p in players])
+
+    values = np.round((chance * average)[:, None] * multipliers[clubs], 2)
+    ids = np.array([p.id for p in players], dtype=np.int64)
+    return ScoreMatrix(ids, gameweeks, values)
@@ -0,0 +1,375 @@
+import argparse
+import dataclasses
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import buildcache
+from loader import build_team
+from model import FantasyModel
+from plan import plan_from_team
+from premierleague import PremierLeague
+from scoring import DEFAULT_HISTORY_LEN, PARAMS_FILE, ScoringParameters, expected_points, load_calibration
+from solver import SolverConfig
+
+# League and expected points by (horizon, history) held by a worker process, set once by init_worker
+_league = None
+_scores = {}
+
+# Seconds a request may wait beyond its solver time limit for the model to be built and the plan returned
+GRACE = 10.0
+
+
+class Rejected(Exception):
+    """A request the service turned away, with the HTTP status to answer it with"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def init_worker(pl: PremierLeague, scores: dict) -> None:
+    global _league, _scores
+    _league = pl
+    _scores = scores
+    # Workers report through their results, the model's progress messages only go to the service log
+    sys.stdout = sys.stderr
+
+
+def warm_up() -> int:
+    return os.getpid()
+
+
+def run_request(request: dict, config: SolverConfig, params: ScoringParameters | None = None,
+                prune: bool = False) -> dict:
+    """Solves one optimise request against the worker's league, computing expected points once per horizon"""
+    horizon_len, history_len = request['horizon'], request['history']
+    gameweeks = range(_league.current_gw, _league.current_gw + horizon_len + 1)
+    if (horizon_len, history_len) not in _scores:
+        _scores[(horizon_len, history_len)] = expected_points(_league, gameweeks, history_len, params)
+
+    my_team_data = {
+        'picks': request['picks'],
+        'entry_history': {'bank': request['bank'], 'value': request['value']}
+    }
+    team = build_team(_league, my_team_data, request.get('transfers', []))
+    model = FantasyModel(_league, team, params)
+    model.solve(horizon_len, history_len, prune=prune, config=config, scores=_scores[(horizon_len, history_len)])
+
+    return {
+        'gameweek': _league.current_gw,
+        'status': model.status,
+        'solution_status': model.solution_status,
+        'objective_value': model.objective_value,
+        'gap': model.gap,
+        'timings': model.timings,
+        'plan': plan_from_team(team, gameweeks) if model.plan is not None else None
+    }
+
+
+class Metrics:
+    """Request counters and the latencies of the most recent requests, safe to update from handler threads"""
+
+    def __init__(self, window: int = 1000) -> None:
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = {'completed': 0, 'failed': 0, 'rejected': 0, 'timed_out': 0}
+        self.latency = deque(maxlen=window)
+        self.solve_time = deque(maxlen=window)
+
+    def admit(self, limit: int) -> bool:
+        """Counts a new request as in flight unless limit requests already are"""
+        with self.lock:
+            if self.in_flight >= limit:
+                self.counts['rejected'] += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self) -> None:
+        """Stops counting a request as in flight, once its job has left the worker pool"""
+        with self.lock:
+            self.in_flight -= 1
+
+    def finished(self, outcome: str, latency: float, solve_time: float | None = None) -> None:
+        with self.lock:
+            self.counts[outcome] += 1
+            self.latency.append(latency)
+            if solve_time is not None:
+                self.solve_time.append(solve_time)
+
+    @staticmethod
+    def percentiles(values: deque) -> dict:
+        if not values:
+            return {}
+        p50, p95, p99 = np.percentile(np.array(values), [50, 95, 99])
+        return {'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3), 'max': round(max(values), 3)}
+
+    def to_dict(self, workers: int) -> dict:
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'queue_depth': max(0, self.in_flight - workers),
+                **self.counts,
+                'latency': self.percentiles(self.latency),
+                'solve_time': self.percentiles(self.solve_time)
+            }
+
+
+class OptimiseService:
+    """
+    Keeps the league resident in a pool of worker processes and answers optimise requests on it. A background
+    thread reloads the league through the build cache whenever the files in data_dir change, starting a fresh
+    pool while requests already running on the old one finish. At most max_queue requests wait for a worker;
+    any more are rejected. Each solve is limited to the request's time_limit, capped at max_time_limit.
+    """
+
+    def __init__(self, data_dir: str = 'data', build_cache: str = 'data/build.pkl', horizon_len: int = 10,
+                 history_len: int = DEFAULT_HISTORY_LEN, workers: int | None = None, max_queue: int = 16,
+                 max_time_limit: float = 60.0, refresh_interval: float = 300.0,
+                 config: SolverConfig | None = None, params: ScoringParameters | None = None,
+                 prune: bool = False) -> None:
+        self.data_dir = data_dir
+        self.build_cache = build_cache
+        self.horizon_len = horizon_len
+        self.history_len = history_len
+        self.workers = workers or os.cpu_count()
+        self.max_queue = max_queue
+        self.max_time_limit = max_time_limit
+        self.refresh_interval = refresh_interval
+        self.config = config or SolverConfig(backend='highs', msg=False)
+        self.params = params
+        self.prune = prune
+
+        self.metrics = Metrics()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.executor = None
+        self.pl = None
+        self.hashes = None
+        self.loaded_at = None
+        self.reloads = 0
+
+    def load(self) -> None:
+        """Builds the league and the default expected points, then swaps in a warmed-up pool holding them"""
+        hashes = buildcache.hash_inputs(self.data_dir)
+        pl, _ = buildcache.load_or_build(self.build_cache, self.data_dir)
+        gameweeks = range(pl.current_gw, pl.current_gw + self.horizon_len + 1)
+        scores = {(self.horizon_len, self.history_len): expected_points(pl, gameweeks, self.history_len, self.params)}
+
+        # Spawned rather than forked, as the service's handler threads may hold locks at fork time
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_worker, initargs=(pl, scores))
+        for future in [executor.submit(warm_up) for _ in range(self.workers)]:
+            future.result()
+
+        with self.lock:
+            previous, self.executor = self.executor, executor
+            self.pl, self.hashes = pl, hashes
+            self.loaded_at = time.time()
+            self.reloads += 1
+        if previous is not None:
+            previous.shutdown(wait=False)
+
+    def refresh_loop(self) -> None:
+        while not self.stopped.wait(self.refresh_interval):
+            try:
+                if buildcache.hash_inputs(self.data_dir) != self.hashes:
+                    print("Data changed, reloading the league")
+                    self.load()
+            except Exception as e:
+                print(f"Reload failed, keeping the current league: {e!r}")
+
+    def start(self) -> None:
+        self.load()
+        threading.Thread(target=self.refresh_loop, name='refresh', daemon=True).start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def parse_request(self, body: dict, pl: PremierLeague) -> dict:
+        """
+        Validates an optimise request. picks is either a list of 15 player ids (the starting 11 first, then the
+        bench, with optional captain and vice_captain ids) or a list of API-shaped picks as in my_team.json.
+        bank is in tenths of a million like the API, value (the squad value including the bank) defaults to
+        the players' current prices plus the bank.
+        """
+        players = pl.get_players()
+        picks = body.get('picks')
+        if not isinstance(picks, list) or len(picks) != 15:
+            raise Rejected(400, "picks must list the 15 players of the squad")
+        if all(isinstance(p, int) for p in picks):
+            captain = body.get('captain', picks[0])
+            vice_captain = body.get('vice_captain', picks[1])
+            picks = [
+                {'element': id, 'position': i + 1, 'is_captain': id == captain, 'is_vice_captain': id == vice_captain}
+                for i, id in enumerate(picks)
+            ]
+        if any(not isinstance(p, dict) or p.get('element') not in players for p in picks):
+            raise Rejected(400, "picks contains an unknown player")
+        if any(not isinstance(p.get('position'), int) for p in picks):
+            raise Rejected(400, "picks must each have a position")
+        captains = [p['element'] for p in picks if p.get('is_captain')]
+        vice_captains = [p['element'] for p in picks if p.get('is_vice_captain')]
+        if len(captains) != 1 or len(vice_captains) != 1 or captains == vice_captains:
+            raise Rejected(400, "picks must have one captain and a different vice captain")
+
+        transfers = body.get('transfers', [])
+        if not isinstance(transfers, list) or any(
+                not isinstance(t, dict) or t.get('element_in') not in players or t.get('element_out') not in players
+                or not isinstance(t.get('event'), int) for t in transfers):
+            raise Rejected(400, "transfers must list objects with a known element_in, element_out and an event")
+
+        horizon_len = int(body.get('horizon', self.horizon_len))
+        history_len = int(body.get('history', self.history_len))
+        if horizon_len < 1 or pl.current_gw + horizon_len > 38:
+            raise Rejected(400, f"horizon must be between 1 and {38 - pl.current_gw}")
+        if not 0 <= history_len < pl.current_gw:
+            raise Rejected(400, f"history must be between 0 and {pl.current_gw - 1}")
+
+        bank = int(body.get('bank', 0))
+        value = int(body.get('value', sum(players[p['element']].cost for p in picks) + bank))
+        time_limit = min(float(body.get('time_limit', self.max_time_limit)), self.max_time_limit)
+        if not time_limit > 0:
+            raise Rejected(400, "time_limit must be positive")
+        return {
+            'picks': picks, 'bank': bank, 'value': value, 'horizon': horizon_len, 'history': history_len,
+            'transfers': transfers, 'time_limit': time_limit
+        }
+
+    def optimise(self, body: dict) -> dict:
+        """Queues a request on the worker pool and waits for its plan, raising Rejected when it can't be served"""
+        with self.lock:
+            executor, pl = self.executor, self.pl
+        if executor is None:
+            raise Rejected(503, "The league is still loading")
+        request = self.parse_request(body, pl)
+        config = dataclasses.replace(self.config, time_limit=request['time_limit'], msg=False)
+
+        start = time.perf_counter()
+        queued = max(0, self.metrics.in_flight - self.workers)
+        if not self.metrics.admit(self.workers + self.max_queue):
+            raise Rejected(503, "Too many queued requests")
+        try:
+            future = executor.submit(run_request, request, config, self.params, self.prune)
+        except RuntimeError:
+            # The pool was shut down by a reload between taking it and submitting
+            self.metrics.release()
+            raise Rejected(503, "The league is reloading, try again")
+        # A timed out job keeps its worker until it finishes, so it stays in flight until then
+        future.add_done_callback(lambda _: self.metrics.release())
+        try:
+            # Requests queued ahead of this one may each hold a worker for up to max_time_limit
+            timeout = request['time_limit'] + GRACE + queued * (self.max_time_limit + GRACE) / self.workers
+            result = future.result(timeout=timeout)
+        except TimeoutError:
+            # Only drops the job if it hasn't started yet; a running solve can't be interrupted
+            future.cancel()
+            self.metrics.finished('timed_out', time.perf_counter() - start)
+            raise Rejected(504, "The request did not finish in time")
+        except Exception:
+            self.metrics.finished('failed', time.perf_counter() - start)
+            raise
+
+        latency = time.perf_counter() - start
+        self.metrics.finished('completed', latency, sum(result['timings'].values()))
+        return {**result, 'latency': round(latency, 3)}
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                'gameweek': self.pl.current_gw if self.pl is not None else None,
+                'loaded_at': self.loaded_at,
+                'reloads': self.reloads,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                **self.metrics.to_dict(self.workers)
+            }
+
+
+def make_handler(service: OptimiseService) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        """GET /health and /metrics report on the service, POST /optimise solves a squad"""
+
+        def send_json(self, status: int, data: dict) -> None:
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == '/health':
+                self.send_json(200 if service.executor is not None else 503, {'ok': service.executor is not None})
+            elif self.path == '/metrics':
+                self.send_json(200, service.status())
+            else:
+                self.send_json(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            if self.path != '/optimise':
+                self.send_json(404, {'error': f"Unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                self.send_json(200, service.optimise(body))
+            except json.JSONDecodeError as e:
+                self.send_json(400, {'error': f"Invalid JSON: {e}"})
+            except (TypeError, ValueError) as e:
+                self.send_json(400, {'error': str(e)})
+            except Rejected as e:
+                self.send_json(e.status, {'error': str(e)})
+            except Exception as e:
+                self.send_json(500, {'error': repr(e)})
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve optimise requests on a league kept in memory")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--build-cache', default='data/build.pkl')
+    parser.add_argument('--horizon', type=int, default=10, help="Horizon whose expected points are precomputed")
+    parser.add_argument('--history', type=int, help="History whose expected points are precomputed "
+                                                    "(defaults to the calibrated one)")
+    parser.add_argument('--params', default=PARAMS_FILE, help="Scoring parameters fitted by calibrate.py")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-queue', type=int, default=16, help="Requests that may wait for a worker")
+    parser.add_argument('--max-time-limit', type=float, default=60.0, help="Longest solve a request may ask for")
+    parser.add_argument('--refresh-interval', type=float, default=300.0, help="Seconds between data checks")
+    parser.add_argument('--backend', choices=['pulp', 'highs'], default='highs')
+    parser.add_argument('--gap', type=float, help="Relative MIP gap at which a solve is considered done")
+    parser.add_argument('--prune', action='store_true', help="Leave out dominated players (heuristic)")
+    args = parser.parse_args()
+
+    params, history_len = load_calibration(args.params)
+    service = OptimiseService(
+        args.data_dir, args.build_cache, args.horizon, args.history if args.history is not None else history_len,
+        args.workers, args.max_queue, args.max_time_limit, args.refresh_interval,
+        SolverConfig(args.backend, gap=args.gap, msg=False), params, args.prune
+    )
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import copy
+from premierleague import PremierLeague
+from fantasyteam import FantasyTeam
+from scoring import ScoringParameters, expected_points
+from matrixmodel import MatrixModel, CompactMatrixModel
+from model import SQUAD_ROLES, STARTING_MIN, STARTING_MAX
+from plan import Plan
+from solver import SolverConfig
+
+
+class ModelSession:
+    """
+    Builds the matrix formulation once for every player and the horizon, then answers what-if questions by
+    changing objective coefficients, variable bounds or the budget in place and re-solving with HiGHS.
+    The fantasy team is never modified; each solve returns a Plan. compact uses matrixmodel.CompactMatrixModel.
+    """
+
+    def __init__(self, pl: PremierLeague, team: FantasyTeam, horizon_len: int, history_len: int,
+                 params: ScoringParameters | None = None, config: SolverConfig | None = None,
+                 compact: bool = False) -> None:
+        self.pl = pl
+        self.team = team
+        self.history_len = history_len
+        self.params = params or ScoringParameters()
+        self.config = config or SolverConfig(backend='highs', msg=False)
+        self.gameweeks = range(pl.current_gw, pl.current_gw + horizon_len + 1)
+
+        self.players = list(pl.get_players().values())
+        self.index = {p.id: i for i, p in enumerate(self.players)}
+        self.expected = expected_points(pl, self.gameweeks, history_len, self.params, players=self.players).values
+
+        self.matrix = (CompactMatrixModel if compact else MatrixModel)(
+            self.players, list(pl.clubs.values()), self.gameweeks, team, self.expected,
+            SQUAD_ROLES, STARTING_MIN, STARTING_MAX
+        )
+
+    def set_expected_points(self, player_id: int, points) -> None:
+        """Overrides a player's expected points, given as one value or one per gameweek of the horizon"""
+        i = self.index[player_id]
+        self.expected[i] = points
+        self.matrix.set_scores(i, self.expected[i])
+
+    def set_chance_of_playing(self, player_id: int, chance: int | None) -> None:
+        """Rescores a player with the given chance of playing (as a percentage, like the API), leaving them as is"""
+        player = copy.copy(self.players[self.index[player_id]])
+        player.chance_of_playing = chance
+        scores = expected_points(self.pl, self.gameweeks, self.history_len, self.params, players=[player])
+        self.set_expected_points(player_id, scores.values[0])
+
+    def fix_player(self, player_id: int) -> None:
+        """Keeps the player in the squad for every future gameweek"""
+        self.matrix.set_selection(self.index[player_id], 1, 1)
+
+    def forbid_player(self, player_id: int) -> None:
+        """Keeps the player out of the squad for every future gameweek"""
+        self.matrix.set_selection(self.index[player_id], 0, 0)
+
+    def release_player(self, player_id: int) -> None:
+        """Removes any fix or forbid on the player"""
+        self.matrix.set_selection(self.index[player_id], 0, 1)
+
+    def set_bank(self, bank: int) -> None:
+        """Changes the money in the bank, keeping the value of the current squad"""
+        self.matrix.set_budget(self.team.squad_value + bank - self.team.bank)
+
+    def solve(self) -> Plan | None:
+        """Re-solves the model as it currently stands, returning None when no solution was found"""
+        self.matrix.solve(self.config.highs_options())
+        self.status = self.matrix.status
+        self.solution_status = self.matrix.solution_status
+        self.objective_value = self.matrix.objective_value
+        self.gap = self.matrix.solver_stats['gap']
+
+        if self.matrix.solution is None:
+            return None
+        return Plan.from_solution(self.players, self.gameweeks, self.matrix.solution, self.expected)
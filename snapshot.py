@@ -0,0 +1,210 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+from buildcache import hash_league_inputs
+from premierleague import Player, Club, Fixture, PremierLeague, Role
+from premierleague.playertable import PlayerTable
+from loader import build_league, get_current_gw, read_league_data
+
+# File layout: magic, header length, JSON header, then 64-byte aligned raw arrays described by the header
+MAGIC = b'FPLSNAP1'
+PREFIX = struct.Struct('<8sQ')
+ALIGN = 64
+
+# Sentinel for a missing chance_of_playing_next_round, which the API reports as null
+NO_CHANCE = -1
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+def build_columns(basic_data: dict, fixture_data: list, player_data: dict) -> tuple[dict, dict]:
+    """Splits the API's JSON into typed columns and the few string fields that live in the header"""
+    elements = basic_data['elements']
+    fixtures = [f for f in fixture_data if f['event'] is not None]
+    histories = [player_data[p['id']]['history'] for p in elements]
+
+    arrays = {
+        'club_id': np.array([c['id'] for c in basic_data['teams']], dtype=np.int16),
+
+        'player_id': np.array([p['id'] for p in elements], dtype=np.int32),
+        'player_club': np.array([p['team'] for p in elements], dtype=np.int16),
+        'player_role': np.array([p['element_type'] for p in elements], dtype=np.int8),
+        'player_cost': np.array([p['now_cost'] for p in elements], dtype=np.int16),
+        'player_total_points': np.array([p['total_points'] for p in elements], dtype=np.int16),
+        'player_chance': np.array([
+            NO_CHANCE if p['chance_of_playing_next_round'] is None else p['chance_of_playing_next_round']
+            for p in elements
+        ], dtype=np.int16),
+        'player_form': np.array([p['form'] for p in elements], dtype=np.float64),
+        'player_points_per_game': np.array([p['points_per_game'] for p in elements], dtype=np.float64),
+        'player_selected_by_percent': np.array([p['selected_by_percent'] for p in elements], dtype=np.float64),
+
+        # History rows of player i are history_*[history_offsets[i]:history_offsets[i + 1]]
+        'history_offsets': np.cumsum([0] + [len(h) for h in histories], dtype=np.int64),
+        'history_round': np.array([f['round'] for h in histories for f in h], dtype=np.int16),
+        'history_points': np.array([f['total_points'] for h in histories for f in h], dtype=np.int16),
+        'history_minutes': np.array([f['minutes'] for h in histories for f in h], dtype=np.int16),
+
+        'fixture_id': np.array([f['id'] for f in fixtures], dtype=np.int32),
+        'fixture_gameweek': np.array([f['event'] for f in fixtures], dtype=np.int16),
+        'fixture_home': np.array([f['team_h'] for f in fixtures], dtype=np.int16),
+        'fixture_away': np.array([f['team_a'] for f in fixtures], dtype=np.int16),
+        'fixture_home_difficulty': np.array([f['team_h_difficulty'] for f in fixtures], dtype=np.int8),
+        'fixture_away_difficulty': np.array([f['team_a_difficulty'] for f in fixtures], dtype=np.int8),
+    }
+
+    header = {
+        'current_gw': get_current_gw(basic_data),
+        'club_name': [c['name'] for c in basic_data['teams']],
+        'club_short_name': [c['short_name'] for c in basic_data['teams']],
+        'player_first_name': [p['first_name'] for p in elements],
+        'player_second_name': [p['second_name'] for p in elements],
+    }
+    return header, arrays
+
+
+def write_snapshot(filepath: str, basic_data: dict, fixture_data: list, player_data: dict,
+                   data_dir: str = 'data') -> None:
+    """Builds the snapshot once from the JSON data read from data_dir, writing it atomically"""
+    header, arrays = build_columns(basic_data, fixture_data, player_data)
+    header['inputs'] = hash_league_inputs(data_dir)
+
+    offset = 0
+    header['arrays'] = {}
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset = align(offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode()
+    data_start = align(PREFIX.size + len(header_bytes))
+
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(PREFIX.pack(MAGIC, len(header_bytes)))
+        file.write(header_bytes)
+        for name, array in arrays.items():
+            file.seek(data_start + header['arrays'][name]['offset'])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp_path, filepath)
+
+
+class Snapshot:
+    """Read-only, memory-mapped view of a snapshot file. Arrays are zero-copy views into the mapping."""
+
+    def __init__(self, filepath: str) -> None:
+        with open(filepath, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_len = PREFIX.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{filepath} is not a league snapshot")
+
+        self.header = json.loads(self.buffer[PREFIX.size:PREFIX.size + header_len])
+        data_start = align(PREFIX.size + header_len)
+
+        self.arrays = {}
+        for name, spec in self.header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape']))
+            self.arrays[name] = np.frombuffer(
+                self.buffer, dtype=dtype, count=count, offset=data_start + spec['offset']
+            ).reshape(spec['shape'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+
+def is_current(filepath: str, data_dir: str = 'data') -> bool:
+    """
+    The snapshot can be used when the JSON data it was built from, player summaries included, is unchanged.
+    Hashing the files is still far cheaper than parsing them.
+    """
+    if not os.path.exists(filepath):
+        return False
+    try:
+        header = Snapshot(filepath).header
+    except (OSError, ValueError, struct.error):
+        return False
+    return header.get('inputs') == hash_league_inputs(data_dir)
+
+
+def load_or_build_league(filepath: str, data_dir: str = 'data') -> PremierLeague:
+    """Loads the league from the snapshot, first rebuilding the snapshot from the JSON data if it is stale"""
+    if is_current(filepath, data_dir):
+        return load_league(filepath)
+
+    basic_data, fixture_data, player_data = read_league_data(data_dir)
+    write_snapshot(filepath, basic_data, fixture_data, player_data, data_dir)
+    return build_league(basic_data, fixture_data, player_data)
+
+
+def load_league(filepath: str) -> PremierLeague:
+    """Constructs a PremierLeague from a snapshot file without parsing any per-player JSON"""
+    snapshot = Snapshot(filepath)
+    header = snapshot.header
+
+    pl = PremierLeague()
+    pl.current_gw = header['current_gw']
+
+    # Create club instances
+    for id, name, short_name in zip(snapshot['club_id'].tolist(), header['club_name'], header['club_short_name']):
+        pl.add_club(Club(id, name, short_name, players={}, fixtures={}))
+
+    # Attach fixtures to club instances
+    for f in zip(*(snapshot[f'fixture_{c}'].tolist() for c in (
+        'id', 'gameweek', 'home', 'away', 'home_difficulty', 'away_difficulty'
+    ))):
+        fixture = Fixture(*f)
+        pl.clubs[fixture.home_team].add_fixture(fixture)
+        pl.clubs[fixture.away_team].add_fixture(fixture)
+
+    # Create player instances
+    offsets = snapshot['history_offsets'].tolist()
+    rounds = snapshot['history_round'].tolist()
+    points = snapshot['history_points'].tolist()
+    minutes = snapshot['history_minutes'].tolist()
+    columns = zip(
+        snapshot['player_id'].tolist(), header['player_first_name'], header['player_second_name'],
+        snapshot['player_club'].tolist(), snapshot['player_role'].tolist(), snapshot['player_cost'].tolist(),
+        snapshot['player_form'].tolist(), snapshot['player_points_per_game'].tolist(),
+        snapshot['player_selected_by_percent'].tolist(), snapshot['player_total_points'].tolist(),
+        snapshot['player_chance'].tolist()
+    )
+
+    for i, (id, first_name, second_name, club_id, role, cost, form, ppg, selected, total, chance) in enumerate(columns):
+        player = Player(id, first_name, second_name, club_id, Role(role))
+        player.cost = cost
+        player.form = form
+        player.points_per_game = ppg
+        player.selected_by_percent = selected
+        player.total_points = total
+        player.chance_of_playing = None if chance == NO_CHANCE else chance
+
+        for k in range(offsets[i], offsets[i + 1]):
+            player.add_gameweek_stat(rounds[k], 'points', points[k])
+            player.add_gameweek_stat(rounds[k], 'minutes', minutes[k])
+
+        pl.get_club(club_id).add_player(player)
+
+    return pl
+
+
+def load_player_table(filepath: str, gameweeks: range = range(1, 39)) -> PlayerTable:
+    """Builds a PlayerTable straight from the snapshot's columns, without creating any Player instances"""
+    snapshot = Snapshot(filepath)
+    chance = snapshot['player_chance']
+    table = PlayerTable(
+        snapshot['player_id'], snapshot['player_club'], snapshot['player_role'], snapshot['player_cost'],
+        np.where(chance == NO_CHANCE, 1.0, np.round(chance / 100, 1)),
+        snapshot.header['player_first_name'], snapshot.header['player_second_name'], gameweeks
+    )
+
+    offsets = snapshot['history_offsets']
+    rows = np.repeat(np.arange(len(table)), np.diff(offsets))
+    table.add_history(rows, snapshot['history_round'], snapshot['history_points'], snapshot['history_minutes'])
+    return table
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pulp import LpSolver
+
+# PuLP's solution status names, shared by both backends
+NO_SOLUTION = 'No Solution Found'
+OPTIMAL = 'Optimal Solution Found'
+FEASIBLE = 'Solution Found'
+INFEASIBLE = 'No Solution Exists'
+UNBOUNDED = 'Solution is Unbounded'
+
+# Solve status of each solution status, the same on both backends. A limit stopping the search with a solution
+# in hand is 'Feasible (limit)'.
+STATUS = {
+    OPTIMAL: 'Optimal',
+    FEASIBLE: 'Feasible (limit)',
+    INFEASIBLE: 'Infeasible',
+    UNBOUNDED: 'Unbounded',
+    NO_SOLUTION: 'Not Solved'
+}
+
+
+@dataclass(frozen=True)
+class SolverConfig:
+    """
+    Chooses how FantasyModel is solved and how long the solver may run.
+
+    backend is 'pulp' to build a PuLP model and solve it with the PuLP solver named by solver (any name
+    from pulp.listSolvers(), e.g. 'PULP_CBC_CMD', 'HiGHS_CMD' or 'GUROBI_CMD'), or 'highs' to solve the
+    sparse matrix formulation in-process with scipy's HiGHS. When time_limit (seconds) or gap (relative
+    MIP gap) stops the search early, the best solution found so far is returned. Its gap and the other
+    branch-and-bound statistics are parsed from CBC's log, which is only captured with msg off; otherwise,
+    and for other PuLP solvers, the gap is only known (as 0) for a solution proven optimal without a gap limit.
+    msg streams the solver's log while it runs.
+    """
+    backend: str = 'pulp'
+    solver: str = 'PULP_CBC_CMD'
+    threads: int | None = None
+    time_limit: float | None = None
+    gap: float | None = None
+    msg: bool = True
+
+    def __post_init__(self) -> None:
+        if self.backend not in ('pulp', 'highs'):
+            raise ValueError(f"Unknown backend {self.backend!r}, expected 'pulp' or 'highs'")
+
+    def pulp_solver(self, warm_start: bool = False, log_path: str | None = None) -> 'LpSolver':
+        """The configured PuLP solver. Options a solver doesn't support are ignored by PuLP."""
+        from pulp import getSolver
+        return getSolver(
+            self.solver,
+            msg=self.msg,
+            timeLimit=self.time_limit,
+            gapRel=self.gap,
+            threads=self.threads,
+            warmStart=warm_start,
+            logPath=log_path
+        )
+
+    def highs_options(self) -> dict:
+        """Options for scipy.optimize.milp. scipy does not expose HiGHS's thread count."""
+        options = {'disp': self.msg}
+        if self.time_limit is not None:
+            options['time_limit'] = self.time_limit
+        if self.gap is not None:
+            options['mip_rel_gap'] = self.gap
+        return options
+
+
+def highs_solution_status(status: int, has_solution: bool) -> str:
+    """Maps a scipy.optimize.milp status code onto a solution status"""
+    if has_solution:
+        return OPTIMAL if status == 0 else FEASIBLE
+    return {2: INFEASIBLE, 3: UNBOUNDED}.get(status, NO_SOLUTION)
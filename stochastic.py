@@ -0,0 +1,136 @@
+from dataclasses import dataclass
+import numpy as np
+from premierleague import PremierLeague
+from scoring import ScoringParameters, ScoreMatrix
+
+# Risk measures that turn each player's sampled points into a single objective coefficient
+MEASURES = ('mean', 'mean_std', 'cvar')
+
+
+@dataclass(frozen=True)
+class RiskConfig:
+    """
+    Sampling and risk settings for stochastic scoring. measure is 'mean' (sample average), 'mean_std'
+    (mean - risk_aversion * standard deviation) or 'cvar' (average of the worst alpha share of outcomes).
+    """
+    samples: int = 1000
+    measure: str = 'mean'
+    risk_aversion: float = 1.0
+    alpha: float = 0.2
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.measure not in MEASURES:
+            raise ValueError(f"Unknown risk measure {self.measure!r}, expected one of {MEASURES}")
+
+
+def appearance_pools(players: list, history: range, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds padded (players, fixtures) arrays of the points scored in each fixture the player appeared in and
+    the cumulative recency weight of those fixtures, plus each player's weighted share of fixtures played.
+    Points are scaled by the player's mean recency weight, as scoring.expected_points averages weighted points
+    over the number of fixtures rather than the total weight.
+    """
+    pools, cumulative, share = [], [], np.zeros(len(players))
+    for i, player in enumerate(players):
+        points, played, total, fixtures = [], [], 0.0, 0
+        for g, w in zip(history, weights):
+            for gw_points, minutes in zip(player.points.get(g, []), player.minutes.get(g, [])):
+                total += w
+                fixtures += 1
+                if minutes:
+                    points.append(gw_points)
+                    played.append(w)
+        pools.append([p * total / fixtures for p in points])
+        cumulative.append(np.cumsum(played))
+        share[i] = sum(played) / total if total else 0
+
+    width = max(1, max(len(p) for p in pools))
+    pool = np.zeros((len(players), width))
+    cum = np.full((len(players), width), np.inf)
+    for i, (points, c) in enumerate(zip(pools, cumulative)):
+        pool[i, :len(points)] = points
+        cum[i, :len(c)] = c
+    return pool, cum, share
+
+
+def fixture_slots(pl: PremierLeague, gameweeks: range, params: ScoringParameters) -> tuple[np.ndarray, dict]:
+    """
+    Dense (clubs, gameweeks, fixtures) array of the multiplier of each fixture a club plays in a gameweek.
+    Unlike scoring.fixture_arrays the fixtures of a double gameweek are kept apart so each is sampled separately.
+    """
+    club_index = {id: i for i, id in enumerate(pl.clubs)}
+    width = max((len(c.fixtures.get(g, [])) for c in pl.clubs.values() for g in gameweeks), default=1)
+    slots = np.zeros((len(club_index), len(gameweeks), max(1, width)))
+
+    for club in pl.clubs.values():
+        for g in gameweeks:
+            for k, f in enumerate(club.fixtures.get(g, [])):
+                at_home = f.home_team == club.id
+                difficulty = f.home_team_difficulty if at_home else f.away_team_difficulty
+                slots[club_index[club.id], g - gameweeks.start, k] = (
+                    1 - params.difficulty_multiplier * difficulty + (params.home_adv if at_home else 0)
+                )
+
+    return slots, club_index
+
+
+def sample_points(pl: PremierLeague, gameweeks: range, history_len: int, samples: int = 1000,
+                  params: ScoringParameters | None = None, players: list | None = None,
+                  seed: int | None = None) -> np.ndarray:
+    """
+    Samples a (players, gameweeks, samples) float32 array of points. For every fixture a player appears with
+    probability chance_of_playing times their recency-weighted share of fixtures played, and then scores a
+    recency-weighted draw from the points of the fixtures they played, scaled by the fixture's multiplier.
+    In expectation the samples average to scoring.expected_points before its rounding.
+    """
+    params = params or ScoringParameters()
+    players = list(pl.get_players().values()) if players is None else players
+    rng = np.random.default_rng(seed)
+
+    history = range(pl.current_gw - history_len, pl.current_gw + 1)
+    weights = 1 - params.fixture_multiplier * (pl.current_gw - np.arange(history.start, history.stop))
+    pool, cum, share = appearance_pools(players, history, weights)
+    appears = np.array([p.chance_of_playing for p in players]) * share
+
+    slots, club_index = fixture_slots(pl, gameweeks, params)
+    clubs = np.array([club_index[p.club_id] for p in players], dtype=np.intp)
+    multipliers = slots[clubs]
+    total_weight = np.where(np.isinf(cum), 0, cum).max(axis=1)
+
+    result = np.zeros((len(players), len(gameweeks), samples), dtype=np.float32)
+    rows = np.arange(len(players))[:, None]
+    for j in range(len(gameweeks)):
+        for k in range(multipliers.shape[2]):
+            if not multipliers[:, j, k].any():
+                continue
+            # Inverse CDF draw from each player's weighted pool, batched across players and samples
+            u = rng.random((len(players), samples)) * total_weight[:, None]
+            picks = np.minimum((cum[:, None, :] <= u[:, :, None]).sum(axis=2), pool.shape[1] - 1)
+            played = rng.random((len(players), samples)) < appears[:, None]
+            result[:, j] += played * pool[rows, picks] * multipliers[:, j, k, None]
+
+    return result
+
+
+def risk_adjusted(samples: np.ndarray, risk: RiskConfig) -> np.ndarray:
+    """Collapses the sample axis into one coefficient per player and gameweek using the configured risk measure"""
+    if risk.measure == 'mean_std':
+        return samples.mean(axis=-1) - risk.risk_aversion * samples.std(axis=-1)
+    if risk.measure == 'cvar':
+        worst = max(1, int(np.ceil(risk.alpha * samples.shape[-1])))
+        return np.partition(samples, worst - 1, axis=-1)[..., :worst].mean(axis=-1)
+    return samples.mean(axis=-1)
+
+
+def stochastic_points(pl: PremierLeague, gameweeks: range, history_len: int, risk: RiskConfig,
+                      params: ScoringParameters | None = None, players: list | None = None) -> ScoreMatrix:
+    """
+    Risk-adjusted expected points as a ScoreMatrix, a drop-in replacement for scoring.expected_points. The
+    objective stays linear in the selections, so the model is no larger than the deterministic one.
+    """
+    players = list(pl.get_players().values()) if players is None else players
+    samples = sample_points(pl, gameweeks, history_len, risk.samples, params, players, risk.seed)
+    values = np.round(risk_adjusted(samples, risk).astype(float), 2)
+    ids = np.array([p.id for p in players], dtype=np.int64)
+    return ScoreMatrix(ids, gameweeks, values)
@@ -0,0 +1,149 @@
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+import snapshot
+from loader import read_team
+from model import FantasyModel
+from premierleague import PremierLeague
+from fantasyteam import FantasyTeam
+from scoring import DEFAULT_HISTORY_LEN, PARAMS_FILE, ScoringParameters, load_calibration
+from solver import SolverConfig
+
+# League and team shared by every scenario solved in a worker process, set once by init_worker
+_league = None
+_team = None
+
+
+@dataclass(frozen=True)
+class Scenario:
+    horizon_len: int = 10
+    history_len: int = DEFAULT_HISTORY_LEN
+    fixture_multiplier: float = ScoringParameters.fixture_multiplier
+    home_adv: float = ScoringParameters.home_adv
+    difficulty_multiplier: float = ScoringParameters.difficulty_multiplier
+
+    def params(self) -> ScoringParameters:
+        return ScoringParameters(self.fixture_multiplier, self.home_adv, self.difficulty_multiplier)
+
+
+def grid(**values: list) -> list[Scenario]:
+    """Every combination of the given Scenario field values, e.g. grid(horizon_len=[5, 10], home_adv=[0, 0.1])"""
+    names = list(values)
+    return [Scenario(**dict(zip(names, combination))) for combination in itertools.product(*values.values())]
+
+
+def calibrated_grid(args: argparse.Namespace) -> list[Scenario]:
+    """The grid of the command line's scenario options, taking calibrate.py's fit for any left out"""
+    params, history_len = load_calibration(args.params)
+    params = params or ScoringParameters()
+    return grid(
+        horizon_len=args.horizon,
+        history_len=args.history or [history_len],
+        fixture_multiplier=args.fixture_multiplier or [params.fixture_multiplier],
+        home_adv=args.home_adv or [params.home_adv],
+        difficulty_multiplier=args.difficulty_multiplier or [params.difficulty_multiplier]
+    )
+
+
+def init_worker(pl: PremierLeague, team: FantasyTeam) -> None:
+    global _league, _team
+    _league = pl
+    _team = team
+
+
+def run_scenario(scenario: Scenario, config: SolverConfig, prune: bool = False) -> dict:
+    """Solves one scenario against the shared league, leaving the shared team untouched"""
+    team = _team.copy()
+    model = FantasyModel(_league, team, scenario.params())
+
+    start = time.perf_counter()
+    model.solve(scenario.horizon_len, scenario.history_len, prune=prune, config=config)
+
+    future = range(_league.current_gw + 1, _league.current_gw + scenario.horizon_len + 1)
+    return {
+        **asdict(scenario),
+        'status': model.status,
+        'objective_value': model.objective_value,
+        'gap': model.gap,
+        'solve_time': round(time.perf_counter() - start, 3),
+        'transfers': {
+            g: ([p.id for p in team.transfers_in.get(g, [])], [p.id for p in team.transfers_out.get(g, [])])
+            for g in future if team.transfers_in.get(g)
+        }
+    }
+
+
+def sweep(pl: PremierLeague, team: FantasyTeam, scenarios: list[Scenario], workers: int | None = None,
+          config: SolverConfig | None = None, prune: bool = False) -> list[dict]:
+    """
+    Solves every scenario in parallel. The league is parsed once by the caller and handed to each worker
+    process when it starts, rather than with every scenario. Results are returned in scenario order.
+    """
+    config = config or SolverConfig(backend='highs', msg=False)
+    results = [None] * len(scenarios)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(pl, team)) as executor:
+        futures = {executor.submit(run_scenario, s, config, prune): i for i, s in enumerate(scenarios)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            print(f"Solved {done}/{len(scenarios)} scenarios")
+
+    return results
+
+
+def format_transfers(pl: PremierLeague, transfers: dict) -> str:
+    players = pl.get_players()
+    return '; '.join(
+        f"GW {g}: {', '.join(players[i].name for i in t_in)} <- {', '.join(players[i].name for i in t_out)}"
+        for g, (t_in, t_out) in transfers.items()
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Solve a grid of model configurations in parallel")
+    parser.add_argument('--horizon', type=int, nargs='+', default=[Scenario.horizon_len])
+    parser.add_argument('--history', type=int, nargs='+')
+    parser.add_argument('--fixture-multiplier', type=float, nargs='+')
+    parser.add_argument('--home-adv', type=float, nargs='+')
+    parser.add_argument('--difficulty-multiplier', type=float, nargs='+')
+    parser.add_argument('--params', default=PARAMS_FILE, help="Fit by calibrate.py used for the options left out")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--backend', choices=['pulp', 'highs'], default='highs')
+    parser.add_argument('--solver', default='PULP_CBC_CMD', help="PuLP solver used by the pulp backend")
+    parser.add_argument('--threads', type=int, help="Solver threads per scenario")
+    parser.add_argument('--time-limit', type=float, help="Seconds each scenario may take before its best plan is used")
+    parser.add_argument('--gap', type=float, help="Relative MIP gap at which a scenario is considered solved")
+    parser.add_argument('--prune', action='store_true', help="Leave out dominated players (heuristic)")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--snapshot', default='data/snapshot.bin')
+    parser.add_argument('--csv', help="Also write the results table to this file")
+    args = parser.parse_args()
+
+    pl = snapshot.load_or_build_league(args.snapshot, args.data_dir)
+    team = read_team(pl, args.data_dir)
+
+    scenarios = calibrated_grid(args)
+    print(f"Sweeping {len(scenarios)} scenarios on {args.workers} workers...")
+    config = SolverConfig(args.backend, args.solver, args.threads, args.time_limit, args.gap, msg=False)
+    results = sweep(pl, team, scenarios, args.workers, config, args.prune)
+
+    for row in results:
+        row['transfers'] = format_transfers(pl, row['transfers'])
+
+    columns = list(results[0])
+    print('\t'.join(columns))
+    for row in sorted(results, key=lambda r: r['objective_value'] or 0, reverse=True):
+        print('\t'.join(str(row[c]) for c in columns))
+
+    if args.csv:
+        with open(args.csv, "w+", newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import os
+import random
+import utils
+from loader import build_league, build_team
+from premierleague import PremierLeague, Role
+from fantasyteam import FantasyTeam
+
+# Share of each club's players in each role, roughly matching the real game
+ROLE_SHARE = {Role.GK: 0.13, Role.DF: 0.33, Role.MF: 0.34, Role.FW: 0.2}
+
+# Players of each role making up the generated squad of 15, and the ones that start
+SQUAD = {Role.GK: 2, Role.DF: 5, Role.MF: 5, Role.FW: 3}
+STARTING = {Role.GK: 1, Role.DF: 4, Role.MF: 4, Role.FW: 2}
+
+
+def generate_data(clubs: int = 20, players_per_club: int = 30, history_len: int = 10, double_gameweeks: int = 2,
+                  blank_gameweeks: int = 1, max_gw: int = 38, seed: int = 0) -> dict:
+    """
+    Generates API-shaped JSON data for a synthetic league: bootstrap-static, fixtures, one element summary per
+    player and a valid squad. The current gameweek is history_len + 1 and the history covers every fixture played
+    so far. Double and blank gameweeks give half of the clubs an extra or no fixture in randomly chosen future weeks.
+    """
+    rnd = random.Random(seed)
+    current_gw = history_len + 1
+    club_ids = list(range(1, clubs + 1))
+
+    # Fixtures: a random pairing each gameweek, with extra pairings in double gameweeks and dropped ones in blanks
+    future = list(range(current_gw + 1, max_gw + 1))
+    doubles = set(rnd.sample(future, min(double_gameweeks, len(future))))
+    blanks = set(rnd.sample([g for g in future if g not in doubles], min(blank_gameweeks, len(future) - len(doubles))))
+    fixture_data = []
+    for g in range(1, max_gw + 1):
+        rounds = 2 if g in doubles else 1
+        for r in range(rounds):
+            ids = club_ids[:]
+            rnd.shuffle(ids)
+            pairs = list(zip(ids[::2], ids[1::2]))
+            if g in blanks or r > 0:
+                pairs = pairs[:len(pairs) // 2]
+            for home, away in pairs:
+                fixture_data.append({
+                    'id': len(fixture_data) + 1, 'event': g, 'team_h': home, 'team_a': away,
+                    'team_h_difficulty': rnd.randint(2, 5), 'team_a_difficulty': rnd.randint(2, 5)
+                })
+
+    played = {c: [] for c in club_ids}
+    for f in fixture_data:
+        if f['event'] <= current_gw:
+            played[f['team_h']].append(f['event'])
+            played[f['team_a']].append(f['event'])
+
+    # Players with a latent skill driving both their points and their price
+    elements, player_data = [], {}
+    for c in club_ids:
+        for role, share in ROLE_SHARE.items():
+            for _ in range(max(SQUAD[role], round(players_per_club * share))):
+                id = len(elements) + 1
+                skill = rnd.random()
+                regular = rnd.random() < 0.6
+                elements.append({
+                    'id': id, 'first_name': "Player", 'second_name': f"{id}", 'team': c,
+                    'element_type': role.value, 'now_cost': 40 + round(skill * 80),
+                    'form': f"{skill * 8:.1f}", 'points_per_game': f"{skill * 6:.1f}",
+                    'selected_by_percent': f"{skill * 30:.1f}", 'total_points': 0,
+                    'chance_of_playing_next_round': rnd.choice([None] * 8 + [0, 25, 50, 75])
+                })
+
+                history = []
+                for g in played[c]:
+                    minutes = rnd.choice([90, 90, 75, 60]) if regular else rnd.choice([0, 0, 15, 30, 90])
+                    points = max(0, round(rnd.gauss(skill * 8, 2.5))) if minutes else 0
+                    history.append({'round': g, 'total_points': points, 'minutes': minutes})
+                elements[-1]['total_points'] = sum(h['total_points'] for h in history)
+                player_data[id] = {'history': history, 'fixtures': [], 'history_past': []}
+
+    basic_data = {
+        'teams': [{'id': c, 'name': f"Club {c}", 'short_name': f"C{c:02d}"} for c in club_ids],
+        'elements': elements,
+        'events': [{'id': g, 'is_current': g == current_gw} for g in range(1, max_gw + 1)]
+    }
+
+    # A squad of cheap players respecting the role and club limits
+    squad, per_club = [], {}
+    for role, n in SQUAD.items():
+        candidates = sorted((e for e in elements if e['element_type'] == role.value), key=lambda e: e['now_cost'])
+        picked = 0
+        for e in candidates:
+            if picked < n and per_club.get(e['team'], 0) < 3:
+                squad.append(e)
+                per_club[e['team']] = per_club.get(e['team'], 0) + 1
+                picked += 1
+
+    starting = [e for role, n in STARTING.items() for e in [s for s in squad if s['element_type'] == role.value][:n]]
+    bench = [e for e in squad if e not in starting]
+    picks = [
+        {'element': e['id'], 'position': i + 1, 'is_captain': i == 1, 'is_vice_captain': i == 2}
+        for i, e in enumerate(starting + bench)
+    ]
+    bank = 50
+    my_team_data = {'picks': picks, 'entry_history': {'bank': bank, 'value': sum(e['now_cost'] for e in squad) + bank}}
+
+    return {
+        'basic': basic_data, 'fixtures': fixture_data, 'players': player_data,
+        'my_team': my_team_data, 'my_transfers': []
+    }
+
+
+def write_data(data_dir: str, data: dict) -> None:
+    """Writes generated data using the same file layout as main.py"""
+    os.makedirs(f'{data_dir}/players', exist_ok=True)
+    utils.write_to_json_file(f'{data_dir}/basic.json', data['basic'])
+    utils.write_to_json_file(f'{data_dir}/fixtures.json', data['fixtures'])
+    utils.write_to_json_file(f'{data_dir}/my_team.json', data['my_team'])
+    utils.write_to_json_file(f'{data_dir}/my_transfers.json', data['my_transfers'])
+    for id, summary in data['players'].items():
+        utils.write_to_json_file(f'{data_dir}/players/{id}.json', summary)
+
+
+def generate_league(**kwargs) -> tuple[PremierLeague, FantasyTeam]:
+    """Generates a synthetic PremierLeague and FantasyTeam in memory. Accepts the arguments of generate_data."""
+    data = generate_data(**kwargs)
+    pl = build_league(data['basic'], data['fixtures'], data['players'])
+    return pl, build_team(pl, data['my_team'], data['my_transfers'])
@@ -0,0 +1,135 @@
+import cProfile
+import io
+import json
+import pstats
+import re
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where max_rss is left as None
+    resource = None
+
+
+@dataclass
+class PhaseStats:
+    seconds: float
+    # Peak Python heap (including NumPy buffers) allocated during the phase, when memory tracking is enabled
+    peak_memory: int | None = None
+    # Peak resident set size of this process so far, where the platform reports it
+    max_rss: int | None = None
+
+
+@dataclass
+class SolveReport:
+    """Structured telemetry for one FantasyModel.solve call"""
+    phases: dict = field(default_factory=dict)
+    model: dict = field(default_factory=dict)
+    solver: dict = field(default_factory=dict)
+    profile: str | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self, filepath: str) -> None:
+        with open(filepath, "w+") as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+class PhaseRecorder:
+    """
+    Attributes wall-clock time and peak memory to consecutive phases. Each call to mark() closes the phase
+    that started at the previous mark. A cProfile profiler started with start_profile() is stopped by the
+    next mark and its statistics are kept on the report.
+    """
+
+    def __init__(self, report: SolveReport, track_memory: bool = False) -> None:
+        self.report = report
+        self.track_memory = track_memory
+        self.profiler = None
+
+        self.started_tracing = track_memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        if track_memory:
+            tracemalloc.reset_peak()
+        self.last_mark = time.perf_counter()
+
+    def start_profile(self) -> None:
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def mark(self, phase: str) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+            stream = io.StringIO()
+            pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(30)
+            self.report.profile = stream.getvalue()
+            self.profiler = None
+
+        now = time.perf_counter()
+        stats = PhaseStats(now - self.last_mark)
+        if resource is not None:
+            stats.max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        if self.track_memory:
+            stats.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+
+        self.report.phases[phase] = stats
+        self.last_mark = time.perf_counter()
+
+    def close(self) -> None:
+        if self.started_tracing:
+            tracemalloc.stop()
+
+
+def constraint_family(name: str) -> str:
+    """Groups PuLP constraint names such as 'GW_12:_Player_301_is_in_the_squad_of_15' by their template"""
+    return re.sub(r'\d+', '#', name)
+
+
+def parse_cbc_log(log: str) -> dict:
+    """Extracts branch-and-bound statistics from a CBC log"""
+    stats = {
+        'result': None, 'nodes': None, 'gap': None, 'best_bound': None, 'time_to_first_incumbent': None,
+        'solver_seconds': None
+    }
+
+    result = re.search(r'^Result - (.*)$', log, re.MULTILINE)
+    if result:
+        stats['result'] = result.group(1).strip()
+
+    nodes = re.search(r'Enumerated nodes:\s+(\d+)', log)
+    if nodes:
+        stats['nodes'] = int(nodes.group(1))
+
+    # CBC signs the gap by the objective sense
+    gap = re.search(r'^Gap:\s+([-\d.e+]+)', log, re.MULTILINE)
+    if gap:
+        stats['gap'] = abs(float(gap.group(1)))
+
+    bound = re.search(r'^(?:Lower|Upper) bound:\s+([-\d.e+]+)', log, re.MULTILINE)
+    if bound:
+        stats['best_bound'] = float(bound.group(1))
+
+    # A proven optimum reports no gap and its objective is the bound
+    objective = re.search(r'^Objective value:\s+([-\d.e+]+)', log, re.MULTILINE)
+    if (stats['result'] or '').startswith('Optimal solution found') and objective and gap is None:
+        stats['gap'] = 0.0
+        stats['best_bound'] = float(objective.group(1))
+
+    incumbent = re.search(r'(?:Integer solution of|MIPStart provided solution).*?\(([\d.]+) seconds\)', log)
+    if incumbent:
+        stats['time_to_first_incumbent'] = float(incumbent.group(1))
+    elif 'MIPStart provided solution' in log:
+        stats['time_to_first_incumbent'] = 0.0
+
+    # CBC's own wall-clock time, so the file export and parsing overhead is the rest of the solve phase
+    seconds = re.search(r'Total time \(CPU seconds\):\s+[\d.]+\s+\(Wallclock seconds\):\s+([\d.]+)', log)
+    if seconds:
+        stats['solver_seconds'] = float(seconds.group(1))
+
+    return stats
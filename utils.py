@@ -1,13 +1,21 @@
-import requests
 import json
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    import requests
 
-def fetch_data(url):
+
+def fetch_response(url: str, headers: dict | None = None) -> 'requests.Response':
+    # Imported on first use so that offline runs never load requests
+    import requests
     try:
-        response_data = requests.get(url)
+        return requests.get(url, headers=headers)
     except requests.exceptions.RequestException as e:
         raise SystemExit(e)
 
+
+def fetch_data(url):
+    response_data = fetch_response(url)
     return json.loads(response_data.text)
 
 